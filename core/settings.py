@@ -1,9 +1,12 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 import environ
 
 from celery.schedules import crontab
 
+from utils.hashers import get_password_hashers
+
 ROOT_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 env = environ.Env()
 
@@ -39,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework_simplejwt.token_blacklist',
@@ -48,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -106,15 +111,78 @@ CELERY_IMPORTS = [
 CELERY_BEAT_SCHEDULE = {
     "expire_tasks": {
         "task": "task_assigner.tasks.expire_tasks", # Task to expire tasks that are past their deadline
-        "schedule": 60,  # Every minute
-    }
+        "schedule": 15 * 60,  # Every 15 minutes, safety net behind the deadline scheduler
+    },
+    "reconcile_user_task_stats": {
+        "task": "task_assigner.tasks.reconcile_user_task_stats", # Repair drift in denormalized user task counters
+        "schedule": crontab(minute=15),  # Every hour
+    },
+    "archive_tasks": {
+        "task": "task_assigner.tasks.archive_tasks", # Move old completed and failed tasks to the archive
+        "schedule": crontab(hour=3, minute=30),  # Every day
+    },
+    "ensure_task_partitions": {
+        "task": "task_assigner.tasks.ensure_task_partitions", # Pre-create monthly task table partitions
+        "schedule": crontab(hour=0, minute=5),  # Every day
+    },
+    "purge_expired_tokens": {
+        "task": "task_assigner.tasks.purge_expired_tokens", # Delete expired outstanding and blacklisted JWTs
+        "schedule": crontab(minute=45),  # Every hour
+    },
 }
 
+# Tasks expired per UPDATE by expire_tasks
+TASK_EXPIRY_BATCH_SIZE = env.int("TASK_EXPIRY_BATCH_SIZE", default=1000)
+
+# Completed and failed tasks untouched for this many days are archived
+TASK_ARCHIVE_AFTER_DAYS = env.int("TASK_ARCHIVE_AFTER_DAYS", default=30)
+# Tasks moved per statement by archive_tasks
+TASK_ARCHIVE_BATCH_SIZE = env.int("TASK_ARCHIVE_BATCH_SIZE", default=1000)
+
+# Expired outstanding tokens deleted per statement by purge_expired_tokens
+TOKEN_PURGE_BATCH_SIZE = env.int("TOKEN_PURGE_BATCH_SIZE", default=5000)
+
+# Monthly task table partitions kept created ahead of the current month
+TASK_PARTITION_MONTHS_AHEAD = env.int("TASK_PARTITION_MONTHS_AHEAD", default=3)
+
+# Tasks locked and assigned per UPDATE by the assignment engine
+TASK_ASSIGNMENT_BATCH_SIZE = env.int("TASK_ASSIGNMENT_BATCH_SIZE", default=5000)
+# Largest batch a worker can claim in one POST /tasks/claim
+TASK_CLAIM_MAX_COUNT = env.int("TASK_CLAIM_MAX_COUNT", default=50)
+# Largest payload accepted by POST /tasks/bulk and /tasks/bulk_transition
+TASK_BULK_MAX_ITEMS = env.int("TASK_BULK_MAX_ITEMS", default=1000)
+# Rows fetched per server-side cursor round trip by GET /tasks/export
+TASK_EXPORT_CHUNK_SIZE = env.int("TASK_EXPORT_CHUNK_SIZE", default=5000)
+
+# Deadline scheduler, drained by `python manage.py run_deadline_scheduler`
+DEADLINE_SCHEDULER_ENABLED = env.bool("DEADLINE_SCHEDULER_ENABLED", default=True)
+DEADLINE_SCHEDULER_REDIS_URL = env("DEADLINE_SCHEDULER_REDIS_URL", default=CELERY_BROKER_URL)
+DEADLINE_SCHEDULER_MAX_SLEEP = env.float("DEADLINE_SCHEDULER_MAX_SLEEP", default=1.0)
+
 WSGI_APPLICATION = "core.wsgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Connections are reused instead of opened for every request or task.
+# DB_POOL=true uses the psycopg 3 pool built into Django: each process keeps
+# DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections and requests wait up to
+# DB_POOL_TIMEOUT seconds for one, which caps the connections a process can
+# open. Otherwise every thread keeps its own connection for DB_CONN_MAX_AGE
+# seconds, checked before reuse.
+DB_POOL = env.bool("DB_POOL", default=False)
+DB_POOL_OPTIONS = {
+    'min_size': env.int("DB_POOL_MIN_SIZE", default=2),
+    'max_size': env.int("DB_POOL_MAX_SIZE", default=10),
+    'timeout': env.float("DB_POOL_TIMEOUT", default=10.0),
+    # Recycled past this age, so failovers and config reloads are picked up.
+    'max_lifetime': env.float("DB_POOL_MAX_LIFETIME", default=1800.0),
+}
+# Pool of each Celery worker process, which runs one task at a time. Raise it
+# to the worker concurrency with `--pool threads`.
+DB_POOL_WORKER_MIN_SIZE = env.int("DB_POOL_WORKER_MIN_SIZE", default=1)
+DB_POOL_WORKER_MAX_SIZE = env.int("DB_POOL_WORKER_MAX_SIZE", default=2)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -123,13 +191,71 @@ DATABASES = {
         'PASSWORD': env.str('DB_PASSWORD', 'postgres'),
         'HOST': env.str('DB_HOST', 'localhost'),
         'PORT': env.str('DB_PORT', '5432'),
+        # Pooled connections are returned to the pool, never kept per thread.
+        'CONN_MAX_AGE': 0 if DB_POOL else env.int("DB_CONN_MAX_AGE", default=60),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': DB_POOL_OPTIONS} if DB_POOL else {},
     }
 }
 
+# Read replicas of the primary, as comma separated `host` or `host:port`
+# sharing its name and credentials. `list` and `retrieve` on the task and
+# user endpoints read from one of them, except for clients that wrote in
+# the last DB_REPLICA_STICKY_SECONDS, which read their writes from the
+# primary. Pins are kept in CACHES, so share it between processes.
+DB_REPLICA_HOSTS = env.list("DB_REPLICA_HOSTS", default=[])
+DATABASE_REPLICA_STICKY_SECONDS = env.int("DB_REPLICA_STICKY_SECONDS", default=5)
+for index, replica in enumerate(DB_REPLICA_HOSTS, start=1):
+    replica_host, _, replica_port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        # Tests get a separate database, so reads served by the primary by
+        # mistake do not go unnoticed.
+        'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica_{index}"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Adds a second database standing in for a replica when there is none, for
+# the routing tests. Only created by test runs and only tests opting in
+# route to it, so leave it off outside of `manage.py test`.
+DB_TEST_REPLICA = env.bool("DB_TEST_REPLICA", default=False)
+if DB_TEST_REPLICA and not DATABASE_REPLICAS:
+    DATABASES['replica_test'] = {
+        **DATABASES['default'],
+        'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"},
+    }
+DATABASE_ROUTERS = ['utils.replicas.PrimaryReplicaRouter']
+
+# Cache
+# Redis in production (e.g. CACHE_URL=redis://redis:6379/1) so every web and
+# worker process sees the same response cache generations.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+# Opt-in cache of task and user list/retrieve responses
+RESPONSE_CACHE_ENABLED = env.bool("RESPONSE_CACHE_ENABLED", default=False)
+RESPONSE_CACHE_TIMEOUT = env.int("RESPONSE_CACHE_TIMEOUT", default=60)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
+# Password hashing. The first hasher of PASSWORD_HASHERS hashes new passwords
+# and existing hashes are upgraded to it on the next successful login; the
+# others are kept so hashes made under another profile still verify.
+# `argon2` requires argon2-cffi.
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "argon2": "utils.hashers.TunedArgon2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+}
+PASSWORD_HASHER_PROFILE = env.str("PASSWORD_HASHER_PROFILE", default="pbkdf2")
+PASSWORD_HASHERS = get_password_hashers(PASSWORD_HASHER_PROFILE, PASSWORD_HASHER_PROFILES)
+# Threads verifying and hashing passwords for the async auth endpoints
+PASSWORD_HASH_WORKERS = env.int("PASSWORD_HASH_WORKERS", default=os.cpu_count() or 1)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -193,7 +319,7 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_RENDERER_CLASSES": DEFAULT_RENDERER_CLASSES,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "utils.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "utils.schema.AutoSchema",
 }
@@ -214,9 +340,64 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=3),
     'SIGNING_KEY': env('SIMPLE_JWT_SIGNING_KEY', default=None) or SECRET_KEY,
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': True
+    'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'task_assigner.serializers.auth.FilteredTokenRefreshSerializer',
 }
 
+# Bloom filters of blacklisted refresh tokens, checked before the blacklist
+# table. The default 8 Mbit per expiry day with 7 hashes keeps false
+# positives near 1% up to ~800k blacklisted tokens a day.
+TOKEN_BLACKLIST_FILTER_ENABLED = env.bool("TOKEN_BLACKLIST_FILTER_ENABLED", default=True)
+TOKEN_BLACKLIST_FILTER_REDIS_URL = env("TOKEN_BLACKLIST_FILTER_REDIS_URL", default=CELERY_BROKER_URL)
+TOKEN_BLACKLIST_FILTER_BITS = env.int("TOKEN_BLACKLIST_FILTER_BITS", default=2 ** 23)
+TOKEN_BLACKLIST_FILTER_HASHES = env.int("TOKEN_BLACKLIST_FILTER_HASHES", default=7)
+
+# Users resolved from access tokens are cached per process for
+# AUTH_USER_CACHE_LOCAL_TTL seconds, then in CACHES for AUTH_USER_CACHE_TTL.
+# The local TTL bounds how long other processes may still see a user
+# that was just changed or deactivated.
+AUTH_USER_CACHE_SIZE = env.int("AUTH_USER_CACHE_SIZE", default=1024)
+AUTH_USER_CACHE_LOCAL_TTL = env.float("AUTH_USER_CACHE_LOCAL_TTL", default=5.0)
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", default=300)
+
+# Per request SQL instrumentation (utils.instrumentation). The Server-Timing
+# header shows query counts and database time to clients, turn it off where
+# that should stay private. Requests slower than SLOW_REQUEST_THRESHOLD_MS
+# log up to SLOW_REQUEST_MAX_STATEMENTS of their SQL statements.
+SERVER_TIMING_ENABLED = env.bool("SERVER_TIMING_ENABLED", default=True)
+SLOW_REQUEST_THRESHOLD_MS = env.int("SLOW_REQUEST_THRESHOLD_MS", default=500)
+SLOW_REQUEST_MAX_STATEMENTS = env.int("SLOW_REQUEST_MAX_STATEMENTS", default=50)
+
+# Prometheus metrics (utils.metrics), served on /metrics and, for Celery
+# workers, on CELERY_METRICS_PORT. Set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory to report every worker process, not only the one scraped. The
+# task and queue gauges are recomputed at most every METRICS_STATUS_TTL
+# seconds. Scrapers must send METRICS_TOKEN as a bearer token: /metrics
+# answers 403 while it is unset, unless METRICS_PUBLIC is set for servers
+# that cannot be reached from outside. The Celery port has no token, keep it
+# private.
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+METRICS_PUBLIC = env.bool("METRICS_PUBLIC", default=False)
+METRICS_STATUS_TTL = env.int("METRICS_STATUS_TTL", default=30)
+METRICS_CELERY_QUEUES = env.list("METRICS_CELERY_QUEUES", default=["celery"])
+CELERY_METRICS_PORT = env.int("CELERY_METRICS_PORT", default=0)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # Slow and over budget requests only, set REQUEST_LOG_LEVEL=INFO to
+        # also log one JSON line per request.
+        "utils.instrumentation": {
+            "handlers": ["console"],
+            "level": env("REQUEST_LOG_LEVEL", default="WARNING"),
+            "propagate": False,
+        },
+    },
+}
 
 CORS_ALLOWED_ORIGINS = [
     "https://example.com",
@@ -11,8 +11,11 @@ from drf_spectacular.views import (
 )
 from rest_framework_simplejwt import views as jwt_views
 
+from utils.metrics import metrics_view
+
 urlpatterns = [
     path(settings.ADMIN_URL, admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     *static(settings.STATIC_URL, document_root=settings.STATIC_ROOT),
 ]
 
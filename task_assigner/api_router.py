@@ -1,8 +1,12 @@
 from core import settings
 from django.urls import path, include
 from rest_framework_nested import routers
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from task_assigner.views.auth import APIRegistrationView, APILoginView
+from task_assigner.views.async_auth import async_login, async_register
+from task_assigner.views.async_tasks import async_task_detail, async_task_list
+from task_assigner.views.cache import ResponseCacheStatsView
 from task_assigner.views.tasks import TaskViewSet
 from task_assigner.views.users import UserViewSet
 
@@ -18,9 +22,19 @@ router.register(r"users", UserViewSet, basename="users")
 auth_urls = [
     path("register", APIRegistrationView.as_view(), name="register"),
     path("login", APILoginView.as_view(), name="login"),
+    path("refresh", TokenRefreshView.as_view(), name="refresh"),
+]
+
+async_auth_urls = [
+    path("register", async_register, name="async-register"),
+    path("login", async_login, name="async-login"),
 ]
 
 urlpatterns = [
     path("", include(router.urls)),
     path("auth/", include(auth_urls)),
+    path("async/auth/", include(async_auth_urls)),
+    path("async/tasks", async_task_list, name="async-task-list"),
+    path("async/tasks/<uuid:external_id>", async_task_detail, name="async-task-detail"),
+    path("cache/stats", ResponseCacheStatsView.as_view(), name="cache-stats"),
 ]
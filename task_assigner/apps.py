@@ -6,4 +6,4 @@ class TaskAssignerConfig(AppConfig):
     name = 'task_assigner'
 
     def ready(self):
-        pass
+        from . import signals  # noqa
@@ -0,0 +1,117 @@
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from task_assigner.models import Task, User, UserTaskStats
+from task_assigner.models.enums import TaskStatus
+from utils.cache import invalidate_cached_responses
+
+
+def get_user_load_heap():
+    """
+    Builds a min-heap of `(active task count, user_id)` for every user that
+    can receive work, reading the load from the denormalized counters.
+    """
+    users = User.objects.filter(is_active=True, deleted=False).values_list(
+        'id', 'task_stats__pending', 'task_stats__in_progress'
+    )
+    heap = [((pending or 0) + (in_progress or 0), user_id) for user_id, pending, in_progress in users]
+    heapq.heapify(heap)
+    return heap
+
+
+def write_assignments(tasks_by_user):
+    """
+    Writes a `user_id -> [task_id, ...]` mapping with one UPDATE joined
+    against unnested arrays. A CASE over the ids would be re-evaluated for
+    every row and grows quadratically with the batch size.
+    """
+    task_ids, user_ids = [], []
+    for user_id, ids in tasks_by_user.items():
+        task_ids.extend(ids)
+        user_ids.extend([user_id] * len(ids))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Task._meta.db_table} AS task
+            SET assigned_to_id = batch.user_id, status = %s, updated_at = %s
+            FROM unnest(%s::bigint[], %s::bigint[]) AS batch (task_id, user_id)
+            WHERE task.id = batch.task_id
+            """,
+            [TaskStatus.PENDING, timezone.now(), task_ids, user_ids],
+        )
+    invalidate_cached_responses(Task)
+
+
+def get_assignable_tasks():
+    return Task.objects.filter(status=TaskStatus.UNASSIGNED, assigned_to=None, deleted=False).by_priority()
+
+
+def claim_tasks(user, count=1):
+    """
+    Atomically assigns the next `count` tasks in priority order to `user`
+    and returns their ids.
+
+    Rows already locked by another claimer are skipped rather than waited
+    on, so concurrent claimers each get distinct tasks without queueing
+    behind one another.
+    """
+    with transaction.atomic():
+        task_ids = list(
+            get_assignable_tasks()
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:count]
+        )
+        if task_ids:
+            write_assignments({user.pk: task_ids})
+            UserTaskStats.apply_deltas(Counter({(user.pk, TaskStatus.PENDING): len(task_ids)}))
+    return task_ids
+
+
+def assign_unassigned_tasks(limit=None, batch_size=None):
+    """
+    Hands `UNASSIGNED` tasks, in priority order, to the least-loaded users
+    and returns how many were assigned.
+
+    Each batch locks its tasks with SKIP LOCKED and is written with a
+    single UPDATE. Claims lock the same way and manual assignments lock the
+    task and re-check that it is still unassigned, so none of them overwrite
+    one another. User load is only read once, the heap is updated
+    in memory as tasks are handed out.
+    """
+    batch_size = batch_size or settings.TASK_ASSIGNMENT_BATCH_SIZE
+    heap = get_user_load_heap()
+    if not heap:
+        return 0
+
+    assigned = 0
+    while limit is None or assigned < limit:
+        size = batch_size if limit is None else min(batch_size, limit - assigned)
+        with transaction.atomic():
+            task_ids = list(
+                get_assignable_tasks()
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:size]
+            )
+            if not task_ids:
+                break
+
+            tasks_by_user = defaultdict(list)
+            for task_id in task_ids:
+                load, user_id = heapq.heappop(heap)
+                tasks_by_user[user_id].append(task_id)
+                heapq.heappush(heap, (load + 1, user_id))
+
+            write_assignments(tasks_by_user)
+            UserTaskStats.apply_deltas(Counter({
+                (user_id, TaskStatus.PENDING): len(ids) for user_id, ids in tasks_by_user.items()
+            }))
+
+        assigned += len(task_ids)
+        if len(task_ids) < size:
+            break
+    return assigned
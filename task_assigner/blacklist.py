@@ -0,0 +1,210 @@
+import hashlib
+import logging
+from datetime import datetime, timezone as dt_timezone
+from functools import cache
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+# Lua expression evaluating to the run id of the Redis server. It is random
+# for every start, also when the dataset is restored from an RDB or AOF file,
+# which may lack the bits set after the file was written.
+SERVER_RUN_ID = "string.match(redis.call('INFO', 'server'), 'run_id:(%w+)')"
+
+# Answers 1 when the jti may be blacklisted, 0 when it certainly is not and
+# -1 while the filters are not trusted, i.e. the ready key does not hold the
+# run id of this server start. ARGV holds the bit positions.
+MIGHT_CONTAIN_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= SERVER_RUN_ID then
+    return -1
+end
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+for _, position in ipairs(ARGV) do
+    if redis.call('GETBIT', KEYS[2], position) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+# Returns the run id and distrust epoch a seed starts from, and whether the
+# filters are already trusted.
+BEGIN_SEED_SCRIPT = """
+local run_id = SERVER_RUN_ID
+local trusted = redis.call('GET', KEYS[1]) == run_id and 1 or 0
+return {run_id, redis.call('GET', KEYS[2]) or '0', trusted}
+"""
+
+# Marks the filters as trusted unless Redis restarted (ARGV[1], the run id)
+# or they were distrusted (ARGV[2], the epoch) since the seed started.
+FINISH_SEED_SCRIPT = """
+if SERVER_RUN_ID ~= ARGV[1] or (redis.call('GET', KEYS[2]) or '0') ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class BlacklistFilter:
+    """
+    Bloom filters of blacklisted refresh token jtis kept in Redis, one bitmap
+    per UTC day of token expiry, so a refresh can skip the blacklist query
+    whenever its token is certainly not blacklisted.
+
+    A jti is added as soon as its blacklist row is saved, so the filters do
+    not miss a blacklisting; false positives only cost the usual database
+    check. Filters are trusted once `seed` recorded every unexpired
+    blacklisted token, and only by the Redis server start that was seeded:
+    a restart, even from a snapshot, or a failed write sends every check back
+    to the database until the next seed. The Redis instance must not evict
+    keys.
+    """
+    key = 'token_blacklist:bloom:{day}'
+    ready_key = 'token_blacklist:bloom:ready'
+    # Bumped by every distrust, so a seed running meanwhile is not trusted.
+    epoch_key = 'token_blacklist:bloom:epoch'
+    server_run_id = SERVER_RUN_ID
+
+    def __init__(self, client, bits, hashes):
+        self.client = client
+        self.bits = bits
+        self.hashes = hashes
+        self.might_contain_script = self.register_script(MIGHT_CONTAIN_SCRIPT)
+        self.begin_seed_script = self.register_script(BEGIN_SEED_SCRIPT)
+        self.finish_seed_script = self.register_script(FINISH_SEED_SCRIPT)
+
+    def register_script(self, script):
+        return self.client.register_script(script.replace('SERVER_RUN_ID', self.server_run_id))
+
+    @classmethod
+    def from_url(cls, url, bits, hashes):
+        return cls(redis.Redis.from_url(url), bits, hashes)
+
+    def day_key(self, expires_at):
+        return self.key.format(day=f'{expires_at.astimezone(dt_timezone.utc):%Y%m%d}')
+
+    def positions(self, jti):
+        # Double hashing: k positions derived from two independent 64-bit halves.
+        digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, tokens):
+        """
+        Records an iterable of `(jti, expires_at)` pairs.
+        """
+        pipeline = self.client.pipeline(transaction=False)
+        for jti, expires_at in tokens:
+            key = self.day_key(expires_at)
+            for position in self.positions(jti):
+                pipeline.setbit(key, position, 1)
+        pipeline.execute()
+
+    def might_contain(self, jti, expires_at):
+        """
+        Returns False when the token is certainly not blacklisted, True when it
+        may be and None when the filters cannot tell yet.
+        """
+        answer = self.might_contain_script(
+            keys=[self.ready_key, self.day_key(expires_at)],
+            args=self.positions(jti),
+        )
+        return None if answer < 0 else bool(answer)
+
+    def seed(self, batch_size):
+        """
+        Adds every unexpired blacklisted token and marks the filters as
+        trusted, returning whether they now are. Does nothing when they
+        already are.
+        """
+        keys = [self.ready_key, self.epoch_key]
+        run_id, epoch, trusted = self.begin_seed_script(keys=keys)
+        if trusted:
+            return False
+        tokens = (
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list('token__jti', 'token__expires_at')
+            .iterator(chunk_size=batch_size)
+        )
+        batch = []
+        for token in tokens:
+            batch.append(token)
+            if len(batch) >= batch_size:
+                self.add(batch)
+                batch = []
+        self.add(batch)
+        return bool(self.finish_seed_script(keys=keys, args=[run_id, epoch]))
+
+    def distrust(self):
+        pipeline = self.client.pipeline()
+        pipeline.incr(self.epoch_key)
+        pipeline.delete(self.ready_key)
+        pipeline.execute()
+
+    def drop_expired(self, now):
+        """
+        Deletes the filters of days whose tokens have all expired and returns
+        how many were deleted.
+        """
+        current = self.day_key(now)
+        expired = [
+            key for key in self.client.scan_iter(match=self.key.format(day='[0-9]*'))
+            if key.decode() < current
+        ]
+        if expired:
+            self.client.delete(*expired)
+        return len(expired)
+
+
+@cache
+def get_blacklist_filter():
+    return BlacklistFilter.from_url(
+        settings.TOKEN_BLACKLIST_FILTER_REDIS_URL,
+        settings.TOKEN_BLACKLIST_FILTER_BITS,
+        settings.TOKEN_BLACKLIST_FILTER_HASHES,
+    )
+
+
+def remember_blacklisted(jti, expires_at):
+    """
+    Adds a blacklisted token to the filters. When that fails the filters are
+    distrusted, since they would otherwise let the token through.
+    """
+    if not settings.TOKEN_BLACKLIST_FILTER_ENABLED:
+        return
+    blacklist_filter = get_blacklist_filter()
+    try:
+        blacklist_filter.add([(jti, expires_at)])
+    except redis.RedisError:
+        logger.warning("Could not add token %s to the blacklist filter.", jti, exc_info=True)
+        try:
+            blacklist_filter.distrust()
+        except redis.RedisError:
+            logger.error("Could not distrust the blacklist filter.", exc_info=True)
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    Refresh token that consults the blacklist filter before querying the
+    blacklist table.
+    """
+
+    def check_blacklist(self):
+        if settings.TOKEN_BLACKLIST_FILTER_ENABLED and 'exp' in self.payload:
+            jti = self.payload[api_settings.JTI_CLAIM]
+            expires_at = datetime.fromtimestamp(self.payload['exp'], tz=dt_timezone.utc)
+            try:
+                if get_blacklist_filter().might_contain(jti, expires_at) is False:
+                    return
+            except redis.RedisError:
+                logger.warning("Blacklist filter unavailable, checking the database.", exc_info=True)
+        super().check_blacklist()
@@ -1,6 +1,14 @@
 import os
+import time
 
 from celery import Celery
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_init,
+    worker_process_init,
+)
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
@@ -17,6 +25,95 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+# Pool options of each database alias, kept out of the main process of a
+# prefork worker and handed to its pool processes.
+deferred_db_pool_options = {}
+
+
+@worker_init.connect
+def size_worker_db_pool(sender=None, **kwargs):
+    """
+    Gives worker processes their own, smaller, connection pool. Runs before
+    the pool processes are forked. With the prefork pool, the main process is
+    left without pool options, so it can never open a pool for its children
+    to inherit: each pool process gets the options back after the fork and
+    opens its own pool on first use.
+    """
+    from celery.concurrency import get_implementation
+    from celery.concurrency.prefork import TaskPool as PreforkPool
+    from django.conf import settings
+    from django.db import connections
+
+    forks = sender is not None and issubclass(get_implementation(sender.pool_cls), PreforkPool)
+    for alias in connections:
+        options = connections.settings[alias].get('OPTIONS', {})
+        if not options.get('pool'):
+            continue
+        pool_options = {
+            **(options['pool'] if isinstance(options['pool'], dict) else {}),
+            'min_size': settings.DB_POOL_WORKER_MIN_SIZE,
+            'max_size': settings.DB_POOL_WORKER_MAX_SIZE,
+        }
+        if forks:
+            del options['pool']
+            deferred_db_pool_options[alias] = pool_options
+        else:
+            options['pool'] = pool_options
+
+
+@worker_process_init.connect
+def restore_worker_db_pool(**kwargs):
+    """
+    Hands a forked pool process the pool options held back from the main
+    process.
+    """
+    from django.db import connections
+
+    for alias, pool_options in deferred_db_pool_options.items():
+        connections.settings[alias]['OPTIONS']['pool'] = pool_options
+
+
+# Start times of the tasks running in this process, by task id.
+task_started_at = {}
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """
+    Serves the metrics of every pool process on CELERY_METRICS_PORT. Pool
+    processes only share their metrics through PROMETHEUS_MULTIPROC_DIR.
+    """
+    from django.conf import settings
+    from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+    if not settings.CELERY_METRICS_PORT or 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(settings.CELERY_METRICS_PORT, registry=registry)
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    from utils.metrics import CELERY_TASK_DURATION
+
+    started = task_started_at.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    from utils.metrics import CELERY_TASK_RETRIES
+
+    CELERY_TASK_RETRIES.labels(sender.name).inc()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
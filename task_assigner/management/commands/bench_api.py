@@ -0,0 +1,294 @@
+import itertools
+import json
+from contextlib import ExitStack
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from task_assigner import api_router
+from task_assigner.models import Task, User
+from task_assigner.models.enums import ACTIVE_TASK_STATUSES, TaskStatus, TaskType
+from utils.benchmark import run
+
+# Routes of api_router left out of the run.
+SKIPPED_ROUTES = ('api-root',)
+
+
+def route_names(patterns):
+    """
+    Returns the names of every route under `patterns`, includes resolved.
+    """
+    names = set()
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            names |= route_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def url(name, **kwargs):
+    return reverse(f'task_assigner:{name}', kwargs=kwargs or None)
+
+
+def as_json(data):
+    return json.dumps(data).encode()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives every route of the API router against a running server, one endpoint at a time, and "
+        "reports requests per second, p50/p95/p99 latency and the SQL queries of one request per endpoint. "
+        "Expects data from `seed_load`; write endpoints change it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the server to measure.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent keep-alive connections.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each endpoint run.")
+        parser.add_argument("--endpoints", default=None, help="Comma separated endpoints to run, all by default.")
+        parser.add_argument("--password", default="load-password", help="Password of the seeded users.")
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=2000,
+            help="Tasks, users and refresh tokens created up front for the destroy and refresh endpoints.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+        parser.add_argument("--output", default=None, help="Also write the JSON results to this file.")
+        parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare with.")
+
+    def prepare(self, options):
+        """
+        Picks the seeded rows the requests refer to and creates the ones
+        consumed by destroy and refresh.
+        """
+        admin = User.objects.filter(is_staff=True, email__startswith='load-').order_by('pk').first()
+        if admin is None:
+            raise CommandError("No seeded admin found, run `python manage.py seed_load` first.")
+        users = list(
+            User.objects.filter(email__startswith='load-', is_staff=False).order_by('?')
+            .values_list('external_id', 'email')[:1000]
+        )
+        tasks = [str(pk) for pk in Task.objects.filter(deleted=False).order_by('?').values_list('external_id', flat=True)[:1000]]
+        active = [
+            str(pk) for pk in Task.objects.filter(deleted=False, status__in=ACTIVE_TASK_STATUSES)
+            .exclude(assigned_to=None)
+            .order_by('?').values_list('external_id', flat=True)[:1000]
+        ]
+        if not users or not tasks or not active:
+            raise CommandError("Not enough seeded users and tasks, run `python manage.py seed_load` first.")
+
+        size = options['pool_size']
+        doomed_tasks = Task.objects.bulk_create(
+            [Task(name=f"bench delete {i}", type=TaskType.LOW) for i in range(size)], batch_size=5000,
+        )
+        doomed_users = User.objects.bulk_create(
+            [User(email=f"bench-delete-{timezone.now():%Y%m%d%H%M%S}-{i}@example.com", password='!') for i in range(size)],
+            batch_size=5000,
+        )
+        return {
+            'token': str(RefreshToken.for_user(admin).access_token),
+            'users': [(str(external_id), email) for external_id, email in users],
+            'tasks': tasks,
+            'active': active,
+            'doomed_tasks': [str(task.external_id) for task in doomed_tasks],
+            'doomed_users': [str(user.external_id) for user in doomed_users],
+            'refresh_tokens': [str(RefreshToken.for_user(admin)) for _ in range(size)],
+        }
+
+    def get_endpoints(self, data, options):
+        """
+        Returns `{name: (route, requests)}` where requests yields
+        `(method, path, body)` tuples.
+        """
+        users, tasks, active = data['users'], data['tasks'], data['active']
+        password = options['password']
+        counter = itertools.count()
+        deadline = (timezone.now() + timedelta(days=3)).isoformat()
+
+        def get(path):
+            return ('GET', path, b'')
+
+        def new_email(prefix):
+            return f"{prefix}-{timezone.now():%Y%m%d%H%M%S}-{next(counter)}@example.com"
+
+        def register(prefix):
+            email = new_email(prefix)
+            return as_json({'email': email, 'name': 'bench', 'password': password, 'password2': password})
+
+        filters = [
+            {'status': TaskStatus.PENDING, 'type': TaskType.URGENT},
+            {'status': TaskStatus.IN_PROGRESS, 'order_by': '-deadline'},
+            {'assigned_to': users[0][0]},
+        ]
+        return {
+            'tasks-list': ('tasks-list', itertools.repeat(get(url('tasks-list') + '?limit=20'))),
+            'tasks-list-filtered': ('tasks-list', itertools.cycle(
+                [get(url('tasks-list') + '?' + urlencode(params)) for params in filters]
+            )),
+            'tasks-list-cursor': ('tasks-list', itertools.repeat(
+                get(url('tasks-list') + '?pagination=cursor&order_by=-deadline&limit=20')
+            )),
+            'tasks-search': ('tasks-list', itertools.cycle(
+                [get(url('tasks-list') + '?' + urlencode({'q': text})) for text in ('backup', 'billing export', 'runbook')]
+            )),
+            'tasks-create': ('tasks-list', (
+                ('POST', url('tasks-list'), as_json({'name': f"bench {i}", 'type': TaskType.NORMAL, 'deadline': deadline}))
+                for i in counter
+            )),
+            'tasks-retrieve': ('tasks-detail', itertools.cycle(
+                [get(url('tasks-detail', external_id=task)) for task in tasks]
+            )),
+            'tasks-partial-update': ('tasks-detail', itertools.cycle(
+                [('PATCH', url('tasks-detail', external_id=task), as_json({'description': 'Updated by bench_api.'}))
+                 for task in active]
+            )),
+            'tasks-destroy': ('tasks-detail', (
+                ('DELETE', url('tasks-detail', external_id=task), b'') for task in data['doomed_tasks']
+            )),
+            'tasks-assign-task': ('tasks-assign-task', (
+                ('POST', url('tasks-assign-task'), as_json({'user_id': user[0], 'task_id': task}))
+                for user, task in zip(itertools.cycle(users), itertools.cycle(active))
+            )),
+            'tasks-complete-task': ('tasks-complete-task', itertools.cycle(
+                [('POST', url('tasks-complete-task', external_id=task), b'') for task in active]
+            )),
+            'tasks-claim': ('tasks-claim', itertools.repeat(('POST', url('tasks-claim'), as_json({'count': 5})))),
+            'tasks-bulk': ('tasks-bulk', (
+                ('POST', url('tasks-bulk'), as_json([
+                    {'name': f"bench bulk {i}-{j}", 'type': TaskType.LOW, 'deadline': deadline} for j in range(20)
+                ]))
+                for i in counter
+            )),
+            'tasks-bulk-transition': ('tasks-bulk-transition', (
+                ('POST', url('tasks-bulk-transition'), as_json({
+                    'external_ids': active[i % len(active):i % len(active) + 20],
+                    'status': (TaskStatus.IN_PROGRESS, TaskStatus.PENDING)[i % 2],
+                }))
+                for i in counter
+            )),
+            'tasks-export': ('tasks-export', itertools.cycle(
+                [get(url('tasks-export') + '?' + urlencode({'assigned_to': user[0]})) for user in users]
+            )),
+            'tasks-auto-assign': ('tasks-auto-assign', itertools.repeat(
+                ('POST', url('tasks-auto-assign'), as_json({'limit': 10}))
+            )),
+            'users-list': ('users-list', itertools.repeat(get(url('users-list') + '?limit=20'))),
+            'users-retrieve': ('users-detail', itertools.cycle(
+                [get(url('users-detail', external_id=user[0])) for user in users]
+            )),
+            'users-partial-update': ('users-detail', itertools.cycle(
+                [('PATCH', url('users-detail', external_id=user[0]), as_json({'name': 'bench'})) for user in users]
+            )),
+            'users-destroy': ('users-detail', (
+                ('DELETE', url('users-detail', external_id=user), b'') for user in data['doomed_users']
+            )),
+            'register': ('register', (('POST', url('register'), register('bench')) for _ in counter)),
+            'login': ('login', itertools.cycle(
+                [('POST', url('login'), as_json({'email': user[1], 'password': password})) for user in users]
+            )),
+            'refresh': ('refresh', (
+                ('POST', url('refresh'), as_json({'refresh': token})) for token in data['refresh_tokens']
+            )),
+            'async-register': ('async-register', (
+                ('POST', url('async-register'), register('bench-async')) for _ in counter
+            )),
+            'async-login': ('async-login', itertools.cycle(
+                [('POST', url('async-login'), as_json({'email': user[1], 'password': password})) for user in users]
+            )),
+            'async-task-list': ('async-task-list', itertools.repeat(get(url('async-task-list') + '?limit=20'))),
+            'async-task-detail': ('async-task-detail', itertools.cycle(
+                [get(url('async-task-detail', external_id=task)) for task in tasks]
+            )),
+            'cache-stats': ('cache-stats', itertools.repeat(get(url('cache-stats')))),
+        }
+
+    def count_queries(self, client, method, path, body, headers):
+        """
+        Replays one request in process and returns its status and the number
+        of SQL queries it ran, on every database.
+        """
+        with ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            response = client.generic(method, path, body, content_type='application/json', headers=headers)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        return response.status_code, sum(len(context.captured_queries) for context in contexts)
+
+    def handle(self, *args, **options):
+        data = self.prepare(options)
+        endpoints = self.get_endpoints(data, options)
+
+        missing = route_names(api_router.urlpatterns) - {route for route, _ in endpoints.values()} - set(SKIPPED_ROUTES)
+        if missing:
+            self.stderr.write(f"Routes without an endpoint: {', '.join(sorted(missing))}")
+        selected = options['endpoints'].split(',') if options['endpoints'] else list(endpoints)
+        unknown = set(selected) - set(endpoints)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        client = Client(raise_request_exception=False)
+        results = []
+        for name in selected:
+            route, requests = endpoints[name]
+            # Some endpoints are admin only, and an admin token keeps the run
+            # independent of permission_action_classes.
+            headers = {'Authorization': f"Bearer {data['token']}"}
+            method, path, body = next(requests)
+            status, queries = self.count_queries(client, method, path, body, headers)
+            summary = run(options['url'], requests, options['concurrency'], options['seconds'], headers=headers)
+            results.append({'endpoint': name, 'route': route, 'method': method, **summary, 'queries': queries, 'status': status})
+
+        output = {
+            'url': options['url'],
+            'concurrency': options['concurrency'],
+            'seconds': options['seconds'],
+            'started_at': timezone.now().isoformat(),
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(output, file, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(output, indent=2))
+            return
+        self.print_table(results, options)
+
+    def print_table(self, results, options):
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = {row['endpoint']: row for row in json.load(file)['results']}
+
+        self.stdout.write(f"{options['url']}, {options['concurrency']} connections, {options['seconds']:.1f}s per endpoint")
+        header = f"{'endpoint':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'queries':>9}"
+        if baseline:
+            header += f"{'req/s Δ':>10}{'p99 Δ':>9}{'queries Δ':>11}"
+        self.stdout.write(header)
+        for row in results:
+            line = (
+                f"{row['endpoint']:<24}{row['rps']:>9.1f}{row['p50_ms'] or 0:>9.1f}{row['p95_ms'] or 0:>9.1f}"
+                f"{row['p99_ms'] or 0:>9.1f}{row['errors']:>8}{row['queries']:>9}"
+            )
+            previous = baseline.get(row['endpoint'])
+            if previous:
+                line += (
+                    f"{self.change(row['rps'], previous['rps']):>10}"
+                    f"{self.change(row['p99_ms'], previous['p99_ms']):>9}"
+                    f"{row['queries'] - previous['queries']:>+11}"
+                )
+            self.stdout.write(line)
+
+    @staticmethod
+    def change(current, previous):
+        if not current or not previous:
+            return '-'
+        return f"{(current - previous) / previous:+.0%}"
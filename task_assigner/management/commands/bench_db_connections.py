@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from utils.benchmark import percentile
+
+# Connection handling modes, applied on top of DATABASES['default'].
+MODES = {
+    # CONN_MAX_AGE=0: connect and disconnect around every request.
+    'new': {'CONN_MAX_AGE': 0},
+    # DB_POOL=false: one connection per thread, health checked and reused.
+    'persistent': {'CONN_MAX_AGE': None},
+    # DB_POOL=true: connections borrowed from the process pool.
+    'pool': {'CONN_MAX_AGE': 0, 'pool': True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares connection setup time and latency of short requests when connecting per request, "
+        "with persistent connections and with the psycopg 3 pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default=",".join(MODES), help="Comma separated modes to measure.")
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent requests, one per thread.")
+        parser.add_argument("--pool-size", type=int, default=4, help="Pool max_size, below --threads to show queueing.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each measurement.")
+        parser.add_argument(
+            "--query",
+            default="SELECT id, status FROM task_assigner_task ORDER BY id LIMIT 10",
+            help="The single query each request runs.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def add_connection(self, mode, pool_size):
+        """
+        Registers a database alias configured for `mode` and returns it.
+        """
+        base = connections.settings[DEFAULT_DB_ALIAS]
+        options = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+        if MODES[mode].get('pool'):
+            options['pool'] = {'min_size': pool_size, 'max_size': pool_size, 'timeout': 30}
+        alias = f'bench_{mode}'
+        connections.settings[alias] = {
+            **base,
+            'CONN_MAX_AGE': MODES[mode]['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': options,
+        }
+        return alias
+
+    def measure(self, mode, options):
+        alias = self.add_connection(mode, options['pool_size'])
+        connect_times, latencies = [], []
+        deadline = time.monotonic() + options['seconds']
+
+        def requests():
+            connection = connections[alias]
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    connection.ensure_connection()
+                    connected = time.perf_counter()
+                    with connection.cursor() as cursor:
+                        cursor.execute(options['query'])
+                        cursor.fetchall()
+                    # What the request_finished signal does after each request.
+                    connection.close_if_unusable_or_obsolete()
+                    finished = time.perf_counter()
+                    connect_times.append(connected - started)
+                    latencies.append(finished - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=requests) for _ in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        if MODES[mode].get('pool'):
+            connections[alias].close_pool()
+        del connections.settings[alias]
+
+        latencies.sort()
+        return {
+            'mode': mode,
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 1),
+            'connect_ms': round(sum(connect_times) / len(connect_times) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        }
+
+    def handle(self, *args, **options):
+        results = [self.measure(mode, options) for mode in options['modes'].split(',')]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{options['threads']} threads, {options['seconds']:.1f}s per mode")
+        self.stdout.write(f"{'mode':<12}{'req/s':>10}{'connect ms':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<12}{row['rps']:>10.1f}{row['connect_ms']:>12.3f}{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}"
+            )
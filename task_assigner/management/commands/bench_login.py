@@ -0,0 +1,64 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Measures password verifications (the cost of a login) per second and per core for each hasher profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            default=",".join(settings.PASSWORD_HASHER_PROFILES),
+            help="Comma separated PASSWORD_HASHER_PROFILES to measure.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.PASSWORD_HASH_WORKERS,
+            help="Concurrent verifications, as in the async login thread pool.",
+        )
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=3.0,
+            help="Duration of each measurement.",
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        cores = min(threads, os.cpu_count() or 1)
+        self.stdout.write(f"{threads} threads on {cores} cores, {options['seconds']:.1f}s per profile")
+        self.stdout.write(f"{'profile':<10}{'ms/login':>10}{'logins/s':>12}{'per core':>12}")
+
+        for profile in options["profiles"].split(","):
+            hasher = import_string(settings.PASSWORD_HASHER_PROFILES[profile])()
+            try:
+                encoded = make_password("bench-password", hasher=hasher)
+            except ValueError as exc:
+                self.stdout.write(f"{profile:<10}skipped: {exc}")
+                continue
+
+            deadline = time.monotonic() + options["seconds"]
+
+            def verify_until_deadline():
+                count = 0
+                while time.monotonic() < deadline:
+                    check_password("bench-password", encoded, preferred=hasher)
+                    count += 1
+                return count
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                logins = sum(executor.map(lambda _: verify_until_deadline(), range(threads)))
+            elapsed = time.monotonic() - started
+
+            rate = logins / elapsed
+            self.stdout.write(
+                f"{profile:<10}{elapsed * 1000 * threads / logins:>10.1f}{rate:>12.1f}{rate / cores:>12.1f}"
+            )
@@ -0,0 +1,59 @@
+import itertools
+import json
+
+from django.core.management.base import BaseCommand
+
+from task_assigner.models import Task
+from utils.benchmark import run
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares requests per second and latency of the task read endpoints served by a WSGI "
+        "server (/v1/tasks) and an ASGI server (/v1/async/tasks). Both servers must already be running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", default="http://127.0.0.1:8000", help="Base URL of the WSGI server.")
+        parser.add_argument("--asgi-url", default="http://127.0.0.1:8001", help="Base URL of the ASGI server.")
+        parser.add_argument("--concurrency", type=int, default=256, help="Concurrent keep-alive connections.")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each measurement.")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def get_requests(self):
+        """
+        Returns the endpoints to measure, as paths relative to the task list.
+        """
+        task_ids = [str(external_id) for external_id in Task.objects.values_list('external_id', flat=True)[:1000]]
+        if not task_ids:
+            raise SystemExit("No tasks to read, seed some first.")
+        return {
+            'list': itertools.repeat(''),
+            'filtered': itertools.cycle(['?status=pending&type=normal', '?status=completed&order_by=-deadline']),
+            'cursor': itertools.repeat('?pagination=cursor&order_by=-deadline&limit=20'),
+            'retrieve': itertools.cycle(f'/{task_id}' for task_id in task_ids),
+        }
+
+    def handle(self, *args, **options):
+        results = []
+        for endpoint, paths in self.get_requests().items():
+            paths = list(itertools.islice(paths, 1000))
+            for server, base_url, prefix in (
+                ('wsgi', options['wsgi_url'], '/v1/tasks'),
+                ('asgi', options['asgi_url'], '/v1/async/tasks'),
+            ):
+                requests = (('GET', f'{prefix}{path}', b'') for path in itertools.cycle(paths))
+                summary = run(base_url, requests, options['concurrency'], options['seconds'])
+                results.append({'endpoint': endpoint, 'server': server, **summary})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{options['concurrency']} connections, {options['seconds']:.1f}s per run")
+        self.stdout.write(f"{'endpoint':<10}{'server':<7}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for row in results:
+            self.stdout.write(
+                f"{row['endpoint']:<10}{row['server']:<7}{row['rps']:>10.1f}"
+                f"{row['p50_ms'] or 0:>10.1f}{row['p99_ms'] or 0:>10.1f}{row['errors']:>8}"
+            )
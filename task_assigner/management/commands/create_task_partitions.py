@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_assigner.partitions import create_task_partitions
+
+
+class Command(BaseCommand):
+    help = "Pre-creates the monthly partitions of the task table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.TASK_PARTITION_MONTHS_AHEAD,
+            help="Number of months after the current one to create partitions for.",
+        )
+
+    def handle(self, *args, **options):
+        created = create_task_partitions(options["months_ahead"])
+        for name in created:
+            self.stdout.write(f"Created partition {name}.")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} task partitions."))
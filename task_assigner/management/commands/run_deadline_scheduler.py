@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from task_assigner.scheduler import get_deadline_scheduler
+from task_assigner.tasks import expire_scheduled_tasks
+
+
+class Command(BaseCommand):
+    help = "Expires tasks as their deadlines pass, draining the Redis deadline scheduler."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TASK_EXPIRY_BATCH_SIZE,
+            help="Maximum number of due tasks expired per UPDATE.",
+        )
+        parser.add_argument(
+            "--max-sleep",
+            type=float,
+            default=settings.DEADLINE_SCHEDULER_MAX_SLEEP,
+            help="Longest idle wait in seconds, bounds how late newly registered deadlines can be picked up.",
+        )
+
+    def handle(self, *args, **options):
+        scheduler = get_deadline_scheduler()
+        batch_size = options["batch_size"]
+        max_sleep = options["max_sleep"]
+        self.stdout.write(f"Draining task deadlines from {scheduler.key}.")
+
+        while True:
+            due = []
+            try:
+                now = timezone.now()
+                due = scheduler.pop_due(now, batch_size)
+                if due:
+                    close_old_connections()
+                    retry_at = now + timedelta(seconds=max_sleep)
+                    expired = expire_scheduled_tasks(scheduler, now, due, retry_at)
+                    self.stdout.write(f"Expired {expired} of {len(due)} due tasks.")
+                    continue
+
+                next_due_in = scheduler.next_due_in(now)
+                time.sleep(max_sleep if next_due_in is None else min(next_due_in, max_sleep))
+            except redis.RedisError as exc:
+                self.stderr.write(f"Deadline scheduler unavailable: {exc}")
+                time.sleep(max_sleep)
+            except DatabaseError as exc:
+                self.stderr.write(f"Could not expire due tasks: {exc}")
+                self.put_back(scheduler, due, now)
+                time.sleep(max_sleep)
+
+    def put_back(self, scheduler, task_ids, now):
+        """
+        Registers popped tasks again after a failed batch. They were due at
+        `now`, the batch re-checks them in the database anyway.
+        """
+        try:
+            scheduler.schedule(dict.fromkeys(task_ids, now))
+        except redis.RedisError as exc:
+            # Left to the periodic expire_tasks scan.
+            self.stderr.write(f"Could not put back {len(task_ids)} due tasks: {exc}")
@@ -0,0 +1,171 @@
+import random
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from task_assigner.models import Task, User
+from task_assigner.models.enums import TaskStatus, TaskType
+from task_assigner.partitions import TASK_TABLE, create_task_partitions, month_start
+from task_assigner.tasks import reconcile_user_task_stats
+from utils.cache import bump_generation
+
+# Columns written by COPY. The serial id and generated search_vector are
+# filled in by the database.
+TASK_COLUMNS = (
+    'external_id', 'name', 'description', 'assigned_to_id', 'status', 'type',
+    'deadline', 'completed_at', 'created_at', 'updated_at', 'deleted',
+)
+
+TYPE_WEIGHTS = {TaskType.URGENT: 10, TaskType.NORMAL: 70, TaskType.LOW: 20}
+ACTIVE_STATUS_WEIGHTS = {TaskStatus.UNASSIGNED: 30, TaskStatus.PENDING: 45, TaskStatus.IN_PROGRESS: 25}
+# Share of finished tasks that failed instead of being completed.
+FAILURE_RATE = 0.1
+# Days after which almost every task is finished.
+DAYS_TO_FINISH = 14
+# Share of tasks created with a deadline, and the mean time they are given.
+DEADLINE_RATE = 0.8
+MEAN_DEADLINE_HOURS = 72
+
+VERBS = ('Review', 'Deploy', 'Audit', 'Fix', 'Migrate', 'Document', 'Test', 'Triage', 'Rotate', 'Clean up')
+OBJECTS = (
+    'billing export', 'login page', 'nightly backup', 'search index', 'payment webhook', 'on-call rota',
+    'release notes', 'TLS certificates', 'customer report', 'staging database', 'mobile build', 'API keys',
+)
+DETAILS = (
+    'See the runbook before starting.', 'Blocked on the vendor until Friday.', 'Customer facing, keep support posted.',
+    'Follow up from the last incident review.', 'Pair with the platform team if needed.', 'Low risk, can be batched.',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates users and tasks with realistic status, type, deadline and assignee distributions "
+        "for load tests. Tasks are written with COPY and spread over the partitions of the last --days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Number of users to create.")
+        parser.add_argument("--tasks", type=int, default=100000, help="Number of tasks to create.")
+        parser.add_argument("--admins", type=int, default=1, help="How many of the users are admins.")
+        parser.add_argument("--days", type=int, default=90, help="Tasks are created over this many past days.")
+        parser.add_argument("--password", default="load-password", help="Password shared by every created user.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Users per INSERT, tasks per COPY.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed, for reproducible data.")
+
+    def create_users(self, rng, options):
+        """
+        Creates the users, hashing the shared password only once.
+        """
+        run = uuid4().hex[:8]
+        password = make_password(options['password'])
+        users = []
+        for index in range(options['users']):
+            admin = index < options['admins']
+            users.append(User(
+                email=f"load-{run}-{index}@example.com",
+                name=f"{rng.choice(('Ada', 'Grace', 'Alan', 'Edsger', 'Barbara', 'Ken'))} {index}",
+                password=password,
+                is_staff=admin,
+                is_superuser=admin,
+                is_admin=admin,
+            ))
+        return User.objects.bulk_create(users, batch_size=options['batch_size'])
+
+    def generate_task(self, rng, now, user_ids, user_weights, days):
+        created_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        age_days = (now - created_at).total_seconds() / 86400
+
+        # Older tasks are more likely to be finished.
+        if rng.random() < min(0.95, age_days / DAYS_TO_FINISH):
+            status = TaskStatus.FAILED if rng.random() < FAILURE_RATE else TaskStatus.COMPLETED
+        else:
+            status = rng.choices(list(ACTIVE_STATUS_WEIGHTS), weights=ACTIVE_STATUS_WEIGHTS.values())[0]
+        task_type = rng.choices(list(TYPE_WEIGHTS), weights=TYPE_WEIGHTS.values())[0]
+
+        deadline = None
+        if rng.random() < DEADLINE_RATE:
+            # Urgent work gets shorter deadlines.
+            mean_hours = MEAN_DEADLINE_HOURS / 4 if task_type == TaskType.URGENT else MEAN_DEADLINE_HOURS
+            deadline = created_at + timedelta(hours=rng.expovariate(1 / mean_hours))
+
+        assigned_to = None
+        if status != TaskStatus.UNASSIGNED:
+            assigned_to = rng.choices(user_ids, cum_weights=user_weights)[0]
+
+        completed_at = None
+        updated_at = created_at
+        if status == TaskStatus.COMPLETED:
+            completed_at = created_at + (min(now, deadline or now) - created_at) * rng.random()
+            updated_at = completed_at
+        elif status != TaskStatus.UNASSIGNED:
+            updated_at = created_at + (now - created_at) * rng.random()
+
+        return (
+            uuid4(),
+            f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}",
+            rng.choice(DETAILS),
+            assigned_to,
+            status,
+            task_type,
+            deadline,
+            completed_at,
+            created_at,
+            updated_at,
+            False,
+        )
+
+    def copy_tasks(self, rows):
+        columns = ', '.join(TASK_COLUMNS)
+        with connection.cursor() as cursor:
+            with cursor.copy(f'COPY {TASK_TABLE} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        started = time.monotonic()
+
+        first_month = month_start(now - timedelta(days=options['days']))
+        months = (now.year - first_month.year) * 12 + now.month - first_month.month
+        created = create_task_partitions(months + settings.TASK_PARTITION_MONTHS_AHEAD, start=first_month)
+        for name in created:
+            self.stdout.write(f"Created partition {name}.")
+
+        with transaction.atomic():
+            users = self.create_users(rng, options)
+            self.stdout.write(f"Created {len(users)} users in {time.monotonic() - started:.1f}s.")
+
+            # A few users carry most of the work, as in any team.
+            user_ids = [user.pk for user in users]
+            user_weights = []
+            total = 0.0
+            for rank in range(len(user_ids)):
+                total += 1 / (rank + 1) ** 0.8
+                user_weights.append(total)
+
+            for offset in range(0, options['tasks'], options['batch_size']):
+                count = min(options['batch_size'], options['tasks'] - offset)
+                self.copy_tasks(
+                    self.generate_task(rng, now, user_ids, user_weights, options['days']) for _ in range(count)
+                )
+            self.stdout.write(f"Created {options['tasks']} tasks in {time.monotonic() - started:.1f}s.")
+
+        # COPY and bulk_create bypass the counters and the cache invalidation.
+        reconcile_user_task_stats()
+        bump_generation(Task, User)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {TASK_TABLE}')
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+
+        admins = [user.email for user in users[:options['admins']]]
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users and {options['tasks']} tasks in {time.monotonic() - started:.1f}s. "
+            f"Admins: {', '.join(admins) or 'none'}, password: {options['password']}"
+        ))
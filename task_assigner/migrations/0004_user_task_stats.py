@@ -0,0 +1,46 @@
+# Generated by Django 5.1.8 on 2026-10-18 01:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_user_task_stats(apps, schema_editor):
+    Task = apps.get_model('task_assigner', 'Task')
+    UserTaskStats = apps.get_model('task_assigner', 'UserTaskStats')
+
+    stats = {}
+    rows = (
+        Task.objects.exclude(assigned_to=None)
+        .values_list('assigned_to', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for user_id, status, total in rows:
+        stats.setdefault(user_id, UserTaskStats(user_id=user_id))
+        setattr(stats[user_id], status, total)
+    UserTaskStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_assigner', '0003_task_deadline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unassigned', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_task_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.8 on 2026-10-18 01:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('task_assigner', '0005_task_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(models.Case(models.When(then=0, type='urgent'), models.When(then=1, type='normal'), default=2), models.OrderBy(models.F('deadline'), nulls_last=True), models.OrderBy(models.F('created_at')), models.OrderBy(models.F('id')), condition=models.Q(('status', 'unassigned')), name='task_unassigned_priority_idx'),
+        ),
+    ]
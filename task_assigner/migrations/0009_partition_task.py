@@ -0,0 +1,172 @@
+# Generated by Django 5.1.8 on 2026-10-18 01:27
+
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Copied from task_assigner.partitions as they were when this migration was
+# written, so later changes to that module do not change what it does.
+TASK_TABLE = 'task_assigner_task'
+DEFAULT_PARTITION = f'{TASK_TABLE}_default'
+MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_sql(month):
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{TASK_TABLE}_p{month:%Y%m}" PARTITION OF "{TASK_TABLE}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def get_table_layout(cursor):
+    """
+    Returns the foreign keys, the index definitions not backing a
+    constraint and the stored columns of the task table.
+    """
+    cursor.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        'WHERE conrelid = %s::regclass AND contype = %s',
+        [TASK_TABLE, 'f'],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass '
+        'AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass)',
+        [TASK_TABLE, TASK_TABLE],
+    )
+    indexes = [definition for definition, in cursor.fetchall()]
+    cursor.execute(
+        'SELECT column_name FROM information_schema.columns '
+        'WHERE table_name = %s AND is_generated = %s ORDER BY ordinal_position',
+        [TASK_TABLE, 'NEVER'],
+    )
+    columns = ', '.join(f'"{name}"' for name, in cursor.fetchall())
+    return foreign_keys, indexes, columns
+
+
+def partition_task_table(apps, schema_editor):
+    """
+    Rebuilds task_assigner_task as a table partitioned by created_at month.
+
+    Renaming the table takes an ACCESS EXCLUSIVE lock, held until the
+    migration commits, so reads and writes of tasks both wait while rows are
+    copied: run it in a maintenance window. The lock is taken up front rather
+    than upgraded later, which could deadlock with concurrent writers. The
+    indexes and foreign keys of the old table are recreated as they were.
+    Identity columns cannot be used on partitioned tables before Postgres 17,
+    so ids come from a plain sequence continuing where the old one stopped.
+
+    external_id is only unique together with created_at from here on. It is
+    generated by uuid4 and read-only in the API; code setting it explicitly
+    has to make sure it is not taken.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TASK_TABLE} IN ACCESS EXCLUSIVE MODE')
+        foreign_keys, indexes, columns = get_table_layout(cursor)
+        cursor.execute(f'SELECT min(created_at), max(created_at) FROM {TASK_TABLE}')
+        first, last = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {TASK_TABLE} RENAME TO {TASK_TABLE}_old')
+        cursor.execute(
+            f'CREATE TABLE {TASK_TABLE} (LIKE {TASK_TABLE}_old INCLUDING DEFAULTS INCLUDING GENERATED) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+
+        now = timezone.now()
+        month = month_start(first or now)
+        last_month = add_months(month_start(max(last or now, now)), MONTHS_AHEAD)
+        while month <= last_month:
+            cursor.execute(partition_sql(month))
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TASK_TABLE} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TASK_TABLE} ({columns}) SELECT {columns} FROM {TASK_TABLE}_old')
+        cursor.execute(f'DROP TABLE {TASK_TABLE}_old')
+
+        cursor.execute(f'ALTER TABLE {TASK_TABLE} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(
+            f'ALTER TABLE {TASK_TABLE} ADD CONSTRAINT task_external_id_created_uniq UNIQUE (external_id, created_at)'
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TASK_TABLE} ADD CONSTRAINT "{name}" {definition}')
+        for definition in indexes:
+            cursor.execute(definition)
+
+        cursor.execute(f'CREATE SEQUENCE {TASK_TABLE}_id_seq OWNED BY {TASK_TABLE}.id')
+        cursor.execute(f"SELECT setval('{TASK_TABLE}_id_seq', COALESCE(max(id), 0) + 1, false) FROM {TASK_TABLE}")
+        cursor.execute(f"ALTER TABLE {TASK_TABLE} ALTER COLUMN id SET DEFAULT nextval('{TASK_TABLE}_id_seq')")
+
+
+def unpartition_task_table(apps, schema_editor):
+    """
+    Rebuilds task_assigner_task as the plain table it was, with an identity
+    id as its primary key and a globally unique external_id, under the same
+    ACCESS EXCLUSIVE lock. Fails if two tasks share an external_id.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TASK_TABLE} IN ACCESS EXCLUSIVE MODE')
+        foreign_keys, indexes, columns = get_table_layout(cursor)
+
+        cursor.execute(f'ALTER SEQUENCE {TASK_TABLE}_id_seq OWNED BY NONE')
+        cursor.execute(f'ALTER TABLE {TASK_TABLE} RENAME TO {TASK_TABLE}_old')
+        cursor.execute(f'CREATE TABLE {TASK_TABLE} (LIKE {TASK_TABLE}_old INCLUDING DEFAULTS INCLUDING GENERATED)')
+        cursor.execute(f'INSERT INTO {TASK_TABLE} ({columns}) SELECT {columns} FROM {TASK_TABLE}_old')
+        cursor.execute(f'DROP TABLE {TASK_TABLE}_old')
+
+        cursor.execute(f'ALTER TABLE {TASK_TABLE} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE {TASK_TABLE}_id_seq')
+        cursor.execute(f'ALTER TABLE {TASK_TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(max(id), 0) + 1, false) FROM {TASK_TABLE}",
+            [TASK_TABLE],
+        )
+        cursor.execute(f'ALTER TABLE {TASK_TABLE} ADD PRIMARY KEY (id)')
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TASK_TABLE} ADD CONSTRAINT "{name}" {definition}')
+        for definition in indexes:
+            cursor.execute(definition.replace(' ON ONLY ', ' ON '))
+
+    Task = apps.get_model('task_assigner', 'Task')
+    partitioned = models.UUIDField(default=uuid.uuid4)
+    unique = models.UUIDField(db_index=True, default=uuid.uuid4, unique=True)
+    for field in (partitioned, unique):
+        field.set_attributes_from_name('external_id')
+        field.model = Task
+    schema_editor.alter_field(Task, partitioned, unique)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_assigner', '0008_archived_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_task_table, unpartition_task_table),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='task',
+                    name='external_id',
+                    field=models.UUIDField(default=uuid.uuid4),
+                ),
+                migrations.AddConstraint(
+                    model_name='task',
+                    constraint=models.UniqueConstraint(fields=('external_id', 'created_at'), name='task_external_id_created_uniq'),
+                ),
+            ],
+        ),
+    ]
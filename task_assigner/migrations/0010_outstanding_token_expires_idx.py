@@ -0,0 +1,26 @@
+# Generated by Django 5.1.8 on 2026-10-18 03:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes token_blacklist_outstandingtoken.expires_at for purge_expired_tokens.
+    The table belongs to simplejwt's token_blacklist app, so the index is
+    created with plain SQL instead of through its model state.
+    """
+
+    atomic = False
+
+    dependencies = [
+        ('task_assigner', '0009_partition_task'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS outstanding_token_expires_idx '
+                'ON token_blacklist_outstandingtoken (expires_at)',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS outstanding_token_expires_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_assigner', '0010_outstanding_token_expires_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtask',
+            name='deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
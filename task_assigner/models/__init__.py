@@ -1,2 +1,4 @@
 from .users import *  # noqa
-from .tasks import *  # noqa
\ No newline at end of file
+from .tasks import *  # noqa
+from .stats import *  # noqa
+from .archive import *  # noqa
\ No newline at end of file
@@ -0,0 +1,84 @@
+from django.db import connection, models
+
+from utils.cache import invalidate_cached_responses
+
+from .enums import TaskStatus, TaskType
+from .tasks import Task
+from .users import User
+
+
+# Columns moved, unchanged, from the task table into the archive.
+ARCHIVED_COLUMNS = (
+    'id',
+    'external_id',
+    'name',
+    'description',
+    'assigned_to_id',
+    'status',
+    'type',
+    'deadline',
+    'completed_at',
+    'created_at',
+    'updated_at',
+    'deleted',
+)
+
+
+class ArchivedTask(models.Model):
+    """
+    Cold storage for completed and failed tasks, moved out of the task table
+    by the `archive_tasks` job. Rows keep the id they had as a Task, and
+    soft-deleted tasks stay `deleted` so the archive does not bring them back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    external_id = models.UUIDField(unique=True)
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    assigned_to = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_tasks',
+        null=True,
+        blank=True,
+        db_index=False,  # covered by archived_assignee_status_idx
+    )
+    status = models.CharField(max_length=20, choices=TaskStatus.choices)
+    type = models.CharField(max_length=20, choices=TaskType.choices)
+    deadline = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['assigned_to', 'status'], name='archived_assignee_status_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def archive(cls, task_ids):
+        """
+        Moves the given tasks into the archive with a single statement and
+        returns how many rows were moved.
+        """
+        columns = ', '.join(ARCHIVED_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {Task._meta.db_table}
+                    WHERE id = ANY(%s)
+                    RETURNING {columns}
+                )
+                INSERT INTO {cls._meta.db_table} ({columns}, archived_at)
+                SELECT {columns}, now() FROM moved
+                """,
+                [list(task_ids)],
+            )
+            moved = cursor.rowcount
+        invalidate_cached_responses(Task, cls)
+        return moved
@@ -20,3 +20,9 @@ class TaskType(models.TextChoices):
     URGENT = 'urgent', _('Urgent')
     NORMAL = 'normal', _('Normal')
     LOW = 'low', _('Low')
+
+
+ACTIVE_TASK_STATUSES = (TaskStatus.UNASSIGNED, TaskStatus.PENDING, TaskStatus.IN_PROGRESS)
+TERMINAL_TASK_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED)
+# Statuses a task can only have while it is assigned to someone.
+ASSIGNED_TASK_STATUSES = (TaskStatus.PENDING, TaskStatus.IN_PROGRESS, TaskStatus.COMPLETED)
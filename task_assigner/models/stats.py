@@ -0,0 +1,125 @@
+from collections import Counter
+
+from django.db import connections, models, router, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from utils.cache import invalidate_cached_responses
+from .enums import TaskStatus
+from .users import User
+
+
+class UserTaskStats(models.Model):
+    """
+    Denormalized task counters for a user, one column per TaskStatus.
+
+    Counters are adjusted in place (see upsert_deltas) whenever a task changes status
+    or assignee, so reading them never scans the user's task history.
+    Archiving a task leaves the counters untouched.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='task_stats',
+        primary_key=True,
+    )
+    unassigned = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Task stats for {self.user_id}"
+
+    @property
+    def total(self):
+        return sum(getattr(self, status) for status in TaskStatus.values)
+
+    @classmethod
+    def apply_deltas(cls, deltas, using=None):
+        """
+        Applies a mapping of `(user_id, status) -> change` to the counters.
+        Entries without a user are ignored since unassigned work has no owner.
+        """
+        per_user = {}
+        for (user_id, status), delta in deltas.items():
+            if user_id is None or not delta:
+                continue
+            per_user.setdefault(user_id, Counter())[status] += delta
+
+        # Users receiving the same changes share one upsert, which keeps bulk
+        # operations to a handful of statements.
+        groups = {}
+        for user_id, changes in per_user.items():
+            changes = frozenset((status, delta) for status, delta in changes.items() if delta)
+            if changes:
+                groups.setdefault(changes, []).append(user_id)
+
+        for changes, user_ids in groups.items():
+            cls.upsert_deltas(dict(changes), user_ids, using=using)
+        if groups:
+            invalidate_cached_responses(cls, using=using)
+
+    @classmethod
+    def upsert_deltas(cls, changes, user_ids, using=None):
+        """
+        Adds the `status -> change` mapping `changes` to the counters of
+        `user_ids` with one statement. Users without a row yet get one
+        starting from the changes, so a first task costs no extra queries.
+        """
+        table = cls._meta.db_table
+        statuses = TaskStatus.values
+        updates = ', '.join(f'{status} = {table}.{status} + EXCLUDED.{status}' for status in changes)
+        with connections[using or router.db_for_write(cls)].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, {', '.join(statuses)}, updated_at)
+                SELECT batch.user_id, {', '.join(['%s'] * len(statuses))}, %s
+                FROM unnest(%s::bigint[]) AS batch (user_id)
+                ON CONFLICT (user_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+                """,
+                [*(changes.get(status, 0) for status in statuses), timezone.now(), list(user_ids)],
+            )
+
+    @classmethod
+    def record_transition(cls, previous, current, using=None):
+        """
+        Moves one task from the `(user_id, status)` pair `previous` to
+        `current`. Either side may be None for creates and deletes.
+        """
+        if previous == current:
+            return
+        deltas = Counter()
+        if previous is not None:
+            deltas[previous] -= 1
+        if current is not None:
+            deltas[current] += 1
+        cls.apply_deltas(deltas, using=using)
+
+    @classmethod
+    def recount(cls, user_id):
+        """
+        Rebuilds the counters of a single user from the task and archive tables
+        while holding the row lock, so concurrent increments are not lost.
+        """
+        from .archive import ArchivedTask
+        from .tasks import Task
+
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(user_id=user_id)], ignore_conflicts=True)
+            stats = cls.objects.select_for_update().get(user_id=user_id)
+            counts = Counter()
+            for model in (Task, ArchivedTask):
+                counts.update(dict(
+                    model.objects.filter(assigned_to_id=user_id)
+                    .values_list('status')
+                    .annotate(total=Count('id'))
+                    .order_by()
+                ))
+            for status in TaskStatus.values:
+                setattr(stats, status, counts.get(status, 0))
+            stats.save()
+            invalidate_cached_responses(cls)
+        return stats
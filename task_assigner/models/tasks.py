@@ -1,15 +1,143 @@
+import re
+from collections import Counter
+from functools import partial
 from uuid import uuid4
 
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField
+from django.db import IntegrityError, models, router, transaction
 
-from .enums import TaskStatus, TaskType
+from task_assigner.scheduler import schedule_task_deadline, sync_task_deadlines
+from utils.cache import invalidate_cached_responses
+from .enums import ACTIVE_TASK_STATUSES, TERMINAL_TASK_STATUSES, TaskStatus, TaskType
 from .users import User
 
+def type_priority():
+    return models.Case(
+        models.When(type=TaskType.URGENT, then=0),
+        models.When(type=TaskType.NORMAL, then=1),
+        default=2,
+    )
+
+
+# Hand-out order of tasks: urgent before normal before low, then earliest
+# deadline (tasks without one last). Mirrored by task_unassigned_priority_idx.
+PRIORITY_ORDERING = (
+    type_priority(),
+    models.F('deadline').asc(nulls_last=True),
+    models.F('created_at').asc(),
+    models.F('id').asc(),
+)
+
+
+# Text search configuration of Task.search_vector. It has to be spelled out
+# for to_tsvector() to be immutable, and queries must use the same one.
+SEARCH_CONFIG = 'english'
+
+
+SEARCH_MODES = ('websearch', 'prefix')
+
+
+def search_query(text, mode='websearch'):
+    """
+    Builds the tsquery for a search box input. `websearch` accepts the usual
+    quotes, `or` and `-` syntax; `prefix` matches every word as a prefix, for
+    search-as-you-type.
+    """
+    if mode == 'prefix':
+        words = re.findall(r'\w+', text)
+        if not words:
+            return None
+        return SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG)
+    return SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+
+
+class TaskQuerySet(models.QuerySet):
+    # Bulk writes skip save() and delete(), so they retire cached responses
+    # here. Model.save() goes through _update() and is not counted twice.
+    def update(self, **kwargs):
+        updated = super().update(**kwargs)
+        invalidate_cached_responses(Task, using=self.db)
+        return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.check_external_ids([obj.external_id for obj in objs])
+        created = super().bulk_create(objs, *args, **kwargs)
+        invalidate_cached_responses(Task, using=self.db)
+        return created
+
+    def delete(self):
+        from .stats import UserTaskStats
+
+        # The rows are locked to adjust the counters and deadlines for them,
+        # and only those are deleted, so a row added meanwhile is not missed.
+        db = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            rows = list(
+                self.using(db).order_by().select_for_update(of=('self',))
+                .values_list('id', 'assigned_to_id', 'status', 'deadline')
+            )
+            locked = self.model.objects.using(db).filter(pk__in=[row[0] for row in rows])
+            deleted = super(TaskQuerySet, locked).delete()
+
+            deltas = Counter()
+            for _, user_id, status, _ in rows:
+                deltas[(user_id, status)] -= 1
+            UserTaskStats.apply_deltas(deltas, using=db)
+
+            scheduled = [row[0] for row in rows if row[3] is not None]
+            if scheduled:
+                transaction.on_commit(partial(sync_task_deadlines, {}, scheduled), using=db)
+            invalidate_cached_responses(Task, using=db)
+        return deleted
+
+    def check_external_ids(self, external_ids):
+        """
+        Raises IntegrityError when one of `external_ids` is repeated or already
+        taken by a task or an archived task. The partitioned table can only
+        keep external_id unique per `created_at`, so inserts check it here.
+        """
+        from .archive import ArchivedTask
+
+        external_ids = list(external_ids)
+        if len(set(external_ids)) < len(external_ids):
+            raise IntegrityError("Duplicate task external_id.")
+        db = self._db or router.db_for_write(self.model)
+        taken = Task.objects.using(db).filter(external_id__in=external_ids).values_list('external_id', flat=True)
+        archived = ArchivedTask.objects.using(db).filter(external_id__in=external_ids).values_list('external_id', flat=True)
+        taken = list(taken.union(archived)[:1])
+        if taken:
+            raise IntegrityError(f"Task external_id {taken[0]} is already taken.")
+
+    def by_priority(self):
+        return self.order_by(*PRIORITY_ORDERING)
+
+    def search(self, text, mode='websearch'):
+        """
+        Filters on `search_vector` (answered by task_search_vector_idx) and
+        orders the matches by rank, name hits weighing more than description.
+        """
+        query = search_query(text, mode)
+        if query is None:
+            return self.none()
+        return self.filter(search_vector=query).annotate(
+            search_rank=SearchRank(models.F('search_vector'), query),
+        ).order_by('-search_rank', '-id')
+
+
 class Task(models.Model):
     """
     Task model representing a task in the system.
+
+    The table is range partitioned by `created_at` month (see
+    task_assigner.partitions), so its primary key in the database is
+    `(id, created_at)` and unique constraints have to include `created_at`.
+    external_id is therefore only unique per `created_at` in the database,
+    and `save()` and `bulk_create()` check new ones against the task and
+    archive tables instead (see TaskQuerySet.check_external_ids).
     """
-    external_id = models.UUIDField(default=uuid4, unique=True, db_index=True)
+    external_id = models.UUIDField(default=uuid4)  # indexed by task_external_id_created_uniq
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     assigned_to = models.ForeignKey(
@@ -18,6 +146,7 @@ class Task(models.Model):
         related_name='tasks',
         null=True,
         blank=True,
+        db_index=False,  # covered by task_assignee_status_dl_idx
     )
     status = models.CharField(
         max_length=20,
@@ -34,6 +163,149 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     deleted = models.BooleanField(default=False)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['assigned_to', 'status', 'deadline'], name='task_assignee_status_dl_idx'),
+            models.Index(fields=['status', 'type', 'created_at'], name='task_status_type_created_idx'),
+            models.Index(
+                fields=['deadline'],
+                name='task_active_deadline_idx',
+                condition=models.Q(status__in=ACTIVE_TASK_STATUSES),
+            ),
+            models.Index(
+                *PRIORITY_ORDERING,
+                name='task_unassigned_priority_idx',
+                condition=models.Q(status=TaskStatus.UNASSIGNED),
+            ),
+            GinIndex(fields=['search_vector'], name='task_search_vector_idx'),
+            models.Index(
+                fields=['updated_at'],
+                name='task_terminal_updated_idx',
+                condition=models.Q(status__in=TERMINAL_TASK_STATUSES),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['external_id', 'created_at'], name='task_external_id_created_uniq'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stats_key = instance.get_stats_key()
+        instance._schedule_key = instance.get_schedule_key()
+        return instance
+
+    def get_stats_key(self):
+        """
+        Returns the `(user_id, status)` pair this task is counted under in
+        `UserTaskStats`, or None when either field was not loaded.
+        """
+        if 'assigned_to_id' not in self.__dict__ or 'status' not in self.__dict__:
+            return None
+        return self.assigned_to_id, self.status
+
+    def get_schedule_key(self):
+        """
+        Returns the `(deadline, status)` pair the deadline scheduler depends
+        on, or None when either field was not loaded.
+        """
+        if 'deadline' not in self.__dict__ or 'status' not in self.__dict__:
+            return None
+        return self.deadline, self.status
+
+    def save(self, *args, **kwargs):
+        from .stats import UserTaskStats
+
+        previous = None if self._state.adding else getattr(self, '_stats_key', None)
+        previous_schedule = (None, None) if self._state.adding else getattr(self, '_schedule_key', None)
+        with transaction.atomic(using=kwargs.get('using')):
+            if self._state.adding:
+                Task.objects.using(kwargs.get('using')).check_external_ids([self.external_id])
+            if self.has_untracked_changes(previous, previous_schedule):
+                previous, previous_schedule = self.load_stored_keys(kwargs.get('using'))
+            super().save(*args, **kwargs)
+            current = self.get_stats_key()
+            if current is not None:
+                UserTaskStats.record_transition(previous, current, using=kwargs.get('using'))
+                self._stats_key = current
+            counted = current is not None and current != previous
+
+            schedule = self.get_schedule_key()
+            if schedule is not None and schedule != previous_schedule:
+                had_deadline = previous_schedule is None or previous_schedule[0] is not None
+                if schedule[0] is not None or had_deadline:
+                    transaction.on_commit(partial(schedule_task_deadline, self.pk, *schedule))
+                self._schedule_key = schedule
+            invalidate_cached_responses(Task, using=kwargs.get('using'))
+        if counted:
+            self.forget_cached_stats()
+
+    def has_untracked_changes(self, previous, previous_schedule):
+        """
+        Tells whether a task loaded without some of the fields its keys are
+        built from had one of those fields set since, which `save` could not
+        compare against what was loaded.
+        """
+        if self._state.adding:
+            return False
+        return (
+            previous is None and ('assigned_to_id' in self.__dict__ or 'status' in self.__dict__)
+        ) or (
+            previous_schedule is None and ('deadline' in self.__dict__ or 'status' in self.__dict__)
+        )
+
+    def load_stored_keys(self, using=None):
+        """
+        Reads the stored assignee, status and deadline under a row lock,
+        fills in those that were never loaded and returns the stored stats
+        and schedule keys, None for a row that no longer exists.
+        """
+        row = (
+            Task.objects.using(using or self._state.db)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values_list('assigned_to_id', 'status', 'deadline')
+            .first()
+        )
+        if row is None:
+            return None, None
+        stored = dict(zip(('assigned_to_id', 'status', 'deadline'), row))
+        for field, value in stored.items():
+            self.__dict__.setdefault(field, value)
+        return (stored['assigned_to_id'], stored['status']), (stored['deadline'], stored['status'])
+
+    def delete(self, *args, **kwargs):
+        from .stats import UserTaskStats
+
+        task_id = self.pk
+        with transaction.atomic(using=kwargs.get('using')):
+            result = super().delete(*args, **kwargs)
+            UserTaskStats.record_transition(getattr(self, '_stats_key', None), None, using=kwargs.get('using'))
+            if self.deadline is not None:
+                transaction.on_commit(partial(sync_task_deadlines, {}, [task_id]))
+            invalidate_cached_responses(Task, using=kwargs.get('using'))
+        self.forget_cached_stats()
+        return result
+
+    def forget_cached_stats(self):
+        """
+        Drops the assignee's `task_stats` loaded through select_related, as
+        its counters were just changed in the database.
+        """
+        if Task.assigned_to.is_cached(self) and self.assigned_to is not None:
+            if User.task_stats.is_cached(self.assigned_to):
+                User.task_stats.related.delete_cached_value(self.assigned_to)
\ No newline at end of file
@@ -0,0 +1,108 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# task_assigner_task is range partitioned by created_at, one partition per
+# calendar month (UTC) named <table>_pYYYYMM, plus a default partition that
+# only catches rows outside of every monthly range.
+TASK_TABLE = 'task_assigner_task'
+DEFAULT_PARTITION = f'{TASK_TABLE}_default'
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TASK_TABLE}_p{month:%Y%m}'
+
+
+def partition_sql(month):
+    """
+    Returns the idempotent DDL creating the partition of `month`.
+    """
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{TASK_TABLE}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def move_default_rows_sql(month, columns):
+    """
+    Returns the DDL creating the partition of `month` when the default
+    partition already holds rows of that month: Postgres refuses to create it
+    then, so the rows are moved into a detached table which is attached once
+    the default partition no longer overlaps its range. `columns` are the
+    stored (not generated) columns of the task table.
+    """
+    name, bounds = partition_name(month), (month.isoformat(), add_months(month, 1).isoformat())
+    columns = ', '.join(f'"{column}"' for column in columns)
+    return [
+        f'LOCK TABLE "{DEFAULT_PARTITION}" IN SHARE ROW EXCLUSIVE MODE',
+        f'CREATE TABLE "{name}" (LIKE "{TASK_TABLE}" INCLUDING DEFAULTS INCLUDING GENERATED)',
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+        f"WHERE created_at >= '{bounds[0]}' AND created_at < '{bounds[1]}' RETURNING {columns}) "
+        f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved',
+        f'ALTER TABLE "{TASK_TABLE}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')",
+    ]
+
+
+def create_task_partitions(months_ahead, start=None):
+    """
+    Creates the monthly partitions from `start` (the current month by
+    default) up to `months_ahead` months later, and returns the names of the
+    partitions that did not exist yet. Rows of those months found in the
+    default partition are moved to their new partition.
+    """
+    first = month_start(start or timezone.now())
+    months = [add_months(first, offset) for offset in range(months_ahead + 1)]
+    existing = set(list_task_partitions())
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for month in months:
+            if partition_name(month) in existing:
+                continue
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s)',
+                [month, add_months(month, 1)],
+            )
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    'SELECT column_name FROM information_schema.columns '
+                    'WHERE table_name = %s AND is_generated = %s ORDER BY ordinal_position',
+                    [TASK_TABLE, 'NEVER'],
+                )
+                columns = [name for name, in cursor.fetchall()]
+                for statement in move_default_rows_sql(month, columns):
+                    cursor.execute(statement)
+            else:
+                cursor.execute(partition_sql(month))
+            created.append(partition_name(month))
+    return created
+
+
+def list_task_partitions():
+    """
+    Returns the names of the partitions attached to the task table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            ORDER BY child.relname
+            """,
+            [TASK_TABLE],
+        )
+        return [name for name, in cursor.fetchall()]
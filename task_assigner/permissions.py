@@ -1,20 +1,18 @@
 from rest_framework import permissions
-from django.shortcuts import get_object_or_404
-
-from task_assigner.models import Task
 
 
 class IsAssignedToTask(permissions.BasePermission):
     """
     Custom permission to only allow users assigned to a task to view or edit it.
+
+    Checked on the task loaded by `get_object`, so the permission costs no
+    query of its own.
     """
 
     def has_permission(self, request, view):
         # Check if the user is authenticated
-        if not request.user.is_authenticated:
-            return False
+        return bool(request.user and request.user.is_authenticated)
 
-        # Check if the user is assigned to the task
-        task_id = view.kwargs.get('external_id')
-        task = get_object_or_404(Task, external_id=task_id)
-        return task.assigned_to == request.user
\ No newline at end of file
+    def has_object_permission(self, request, view, obj):
+        # Compare ids, the assignee does not need to be loaded for this
+        return obj.assigned_to_id is not None and obj.assigned_to_id == request.user.pk
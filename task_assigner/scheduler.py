@@ -0,0 +1,95 @@
+import logging
+from functools import cache
+
+import redis
+from django.conf import settings
+
+from task_assigner.models.enums import ACTIVE_TASK_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Pops every member scored at or below ARGV[1], at most ARGV[2] of them, in
+# one atomic step so concurrent drainers never expire the same task twice.
+POP_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+
+class DeadlineScheduler:
+    """
+    Registry of pending task deadlines kept in a Redis sorted set, scored by
+    the deadline as a unix timestamp and keyed by task primary key.
+
+    Entries are hints: whoever drains them must re-check the task in the
+    database, and the periodic `expire_tasks` scan covers anything missed.
+    """
+    key = 'task_assigner:deadlines'
+
+    def __init__(self, client):
+        self.client = client
+        self.pop_due_script = client.register_script(POP_DUE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        return cls(redis.Redis.from_url(url))
+
+    def schedule(self, deadlines):
+        """
+        Registers a mapping of `task_id -> deadline`, replacing earlier entries.
+        """
+        if deadlines:
+            self.client.zadd(self.key, {task_id: deadline.timestamp() for task_id, deadline in deadlines.items()})
+
+    def unschedule(self, task_ids):
+        if task_ids:
+            self.client.zrem(self.key, *task_ids)
+
+    def pop_due(self, now, limit):
+        """
+        Removes and returns the ids of up to `limit` tasks due at `now`.
+        """
+        return [int(task_id) for task_id in self.pop_due_script(keys=[self.key], args=[now.timestamp(), limit])]
+
+    def next_due_in(self, now):
+        """
+        Seconds until the earliest registered deadline, or None when empty.
+        """
+        earliest = self.client.zrange(self.key, 0, 0, withscores=True)
+        if not earliest:
+            return None
+        return max(earliest[0][1] - now.timestamp(), 0)
+
+
+@cache
+def get_deadline_scheduler():
+    return DeadlineScheduler.from_url(settings.DEADLINE_SCHEDULER_REDIS_URL)
+
+
+def sync_task_deadlines(scheduled, unscheduled=()):
+    """
+    Pushes deadline changes to the scheduler. Failures are only logged since
+    the periodic full scan still expires the affected tasks.
+    """
+    if not settings.DEADLINE_SCHEDULER_ENABLED:
+        return
+    try:
+        scheduler = get_deadline_scheduler()
+        scheduler.schedule(scheduled)
+        scheduler.unschedule(list(unscheduled))
+    except redis.RedisError:
+        logger.warning("Could not update the deadline scheduler.", exc_info=True)
+
+
+def schedule_task_deadline(task_id, deadline, status):
+    """
+    Registers the deadline of an active task, or drops the entry once the
+    task has no deadline or reached a terminal status.
+    """
+    if deadline is not None and status in ACTIVE_TASK_STATUSES:
+        sync_task_deadlines({task_id: deadline})
+    else:
+        sync_task_deadlines({}, [task_id])
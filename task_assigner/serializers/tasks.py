@@ -1,11 +1,58 @@
+from collections import Counter
+from functools import partial
+
 from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
-from task_assigner.models import Task, User
-from task_assigner.models.enums import TaskStatus
+from task_assigner.models import ArchivedTask, Task, User, UserTaskStats
+from task_assigner.models.enums import ACTIVE_TASK_STATUSES, ASSIGNED_TASK_STATUSES, TaskStatus
+from task_assigner.scheduler import sync_task_deadlines
 from .users import UserSerializer
 
 
+class BulkTaskListSerializer(serializers.ListSerializer):
+    """
+    List serializer used by `TaskSerializer(many=True)` for bulk creation.
+    Items are validated one by one so a bad item does not fail the batch.
+    """
+
+    def validate_items(self):
+        """
+        Returns the validated data of the valid items and the errors of the
+        others, keyed by their position in the payload.
+        """
+        if not isinstance(self.initial_data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of tasks.']})
+        if not self.initial_data:
+            raise serializers.ValidationError({'non_field_errors': ['Expected at least one task.']})
+        if len(self.initial_data) > settings.TASK_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'At most {settings.TASK_BULK_MAX_ITEMS} tasks can be sent at once.']}
+            )
+
+        validated, errors = [], []
+        for index, item in enumerate(self.initial_data):
+            try:
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+        return validated, errors
+
+    def create(self, validated_data):
+        tasks = Task.objects.bulk_create([Task(**attrs) for attrs in validated_data], batch_size=1000)
+        deadlines = {
+            task.pk: task.deadline
+            for task in tasks
+            if task.deadline is not None and task.status in ACTIVE_TASK_STATUSES
+        }
+        if deadlines:
+            transaction.on_commit(partial(sync_task_deadlines, deadlines))
+        return tasks
+
+
 class TaskSerializer(serializers.ModelSerializer):
     """
     Serializer for the Task model.
@@ -27,6 +74,23 @@ class TaskSerializer(serializers.ModelSerializer):
             'updated_at'
         )
         read_only_fields = ('external_id', 'created_at', 'updated_at', 'assigned_to')
+        list_serializer_class = BulkTaskListSerializer
+        # task_external_id_created_uniq only covers generated, read-only
+        # fields, so checking it would cost a query per task for nothing.
+        validators = []
+
+
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for archived tasks, shaped like TaskSerializer.
+    """
+
+    assigned_to = UserSerializer(read_only=True)
+
+    class Meta:
+        model = ArchivedTask
+        fields = TaskSerializer.Meta.fields + ('archived_at',)
+        read_only_fields = fields
 
 
 class AssignTaskSerializer(serializers.ModelSerializer):
@@ -57,13 +121,122 @@ class AssignTaskSerializer(serializers.ModelSerializer):
         user_id = validated_data.pop('user_id')
         task_id = validated_data.pop('task_id')
 
-        try:
-            task = get_object_or_404(Task, external_id=task_id)
+        # The row is locked and checked before it is written, so a task
+        # claimed or auto-assigned in the meantime is not handed out twice.
+        with transaction.atomic():
+            task = get_object_or_404(Task.objects.select_for_update(), external_id=task_id, deleted=False)
             user = get_object_or_404(User, external_id=user_id)
+            if task.status != TaskStatus.UNASSIGNED or task.assigned_to_id is not None:
+                raise serializers.ValidationError({'task_id': ["Task is already assigned."]})
 
             task.assigned_to = user
             task.status = TaskStatus.PENDING
-            task.save()
-            return task
-        except Task.DoesNotExist:
-            raise serializers.ValidationError("Task not found.")
+            task.save(update_fields=['assigned_to', 'status', 'updated_at'])
+        return task
+
+
+class AutoAssignTaskSerializer(serializers.Serializer):
+    """
+    Serializer for triggering the automatic assignment engine.
+    """
+
+    limit = serializers.IntegerField(min_value=1, required=False)
+    run_async = serializers.BooleanField(default=False)
+
+
+class ClaimTaskSerializer(serializers.Serializer):
+    """
+    Serializer for claiming the next unassigned tasks.
+    """
+
+    count = serializers.IntegerField(min_value=1, max_value=settings.TASK_CLAIM_MAX_COUNT, default=1)
+
+
+class TaskExportSerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the task export.
+    """
+
+    export_format = serializers.ChoiceField(choices=('ndjson', 'csv'), default='ndjson')
+
+
+class BulkTransitionSerializer(serializers.Serializer):
+    """
+    Serializer for moving many tasks to the same status in one UPDATE.
+    Malformed ids, missing tasks and invalid transitions are reported per
+    item instead of failing the batch.
+    """
+
+    external_ids = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.TASK_BULK_MAX_ITEMS,
+    )
+    status = serializers.ChoiceField(choices=TaskStatus.choices)
+
+    @staticmethod
+    def get_transition_error(assigned_to_id, target):
+        if target in ASSIGNED_TASK_STATUSES and assigned_to_id is None:
+            return f'Only assigned tasks can be moved to {target}.'
+        if target == TaskStatus.UNASSIGNED and assigned_to_id is not None:
+            return 'Assigned tasks cannot be moved to unassigned.'
+        return None
+
+    def create(self, validated_data):
+        target = validated_data['status']
+        now = timezone.now()
+
+        errors = {}
+        external_ids = {}
+        uuid_field = serializers.UUIDField()
+        for value in validated_data['external_ids']:
+            try:
+                external_ids[uuid_field.run_validation(value)] = value
+            except serializers.ValidationError as exc:
+                errors[value] = exc.detail
+
+        with transaction.atomic():
+            rows = list(
+                Task.objects.filter(external_id__in=external_ids, deleted=False)
+                .order_by('id')
+                .select_for_update()
+                .values_list('id', 'external_id', 'assigned_to_id', 'status', 'deadline')
+            )
+            found = {row[1] for row in rows}
+            for external_id, value in external_ids.items():
+                if external_id not in found:
+                    errors[value] = ['Task not found.']
+
+            changed = []
+            for row in rows:
+                error = self.get_transition_error(row[2], target)
+                if error:
+                    errors[external_ids[row[1]]] = [error]
+                elif row[3] != target:
+                    changed.append(row)
+
+            # Only completed tasks keep a completion time, expire_tasks
+            # skips the others otherwise.
+            updates = {
+                'status': target,
+                'updated_at': now,
+                'completed_at': now if target == TaskStatus.COMPLETED else None,
+            }
+            Task.objects.filter(pk__in=[row[0] for row in changed]).update(**updates)
+
+            deltas = Counter()
+            for _, _, user_id, previous, _ in changed:
+                deltas[(user_id, previous)] -= 1
+                deltas[(user_id, target)] += 1
+            UserTaskStats.apply_deltas(deltas)
+
+            deadlines = {row[0]: row[4] for row in changed if row[4] is not None}
+            if deadlines and target in ACTIVE_TASK_STATUSES:
+                transaction.on_commit(partial(sync_task_deadlines, deadlines))
+            elif deadlines:
+                transaction.on_commit(partial(sync_task_deadlines, {}, list(deadlines)))
+
+        return {
+            'updated': [str(row[1]) for row in changed],
+            'errors': [{'external_id': value, 'errors': detail} for value, detail in errors.items()],
+        }
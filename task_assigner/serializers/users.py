@@ -1,11 +1,11 @@
 from rest_framework import serializers
-from task_assigner.models import User
+from task_assigner.models import User, UserTaskStats
 
 
 class UserSerializer(serializers.ModelSerializer):
     completion_percentage = serializers.SerializerMethodField(read_only=True)
     meta = serializers.SerializerMethodField(read_only=True)
-    total_tasks_assigned = serializers.IntegerField(source='tasks.count', read_only=True)
+    total_tasks_assigned = serializers.SerializerMethodField(read_only=True)
     total_tasks_completed = serializers.SerializerMethodField(read_only=True)
     total_tasks_in_progress = serializers.SerializerMethodField(read_only=True)
     total_tasks_failed = serializers.SerializerMethodField(read_only=True)
@@ -37,19 +37,33 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
 
+    def get_task_stats(self, obj):
+        """
+        Reads the denormalized `UserTaskStats` row. Querysets should use
+        `select_related('task_stats')`, otherwise this costs one lookup per user.
+        """
+        try:
+            return obj.task_stats
+        except UserTaskStats.DoesNotExist:
+            # Counters are created lazily, a missing row means no tasks yet.
+            obj.task_stats = UserTaskStats(user=obj)
+            return obj.task_stats
+
+    def get_total_tasks_assigned(self, obj):
+        return self.get_task_stats(obj).total
+
     def get_total_tasks_completed(self, obj):
-        return obj.tasks.filter(status='completed').count()
+        return self.get_task_stats(obj).completed
 
     def get_total_tasks_in_progress(self, obj):
-        return obj.tasks.filter(status='in_progress').count()
+        return self.get_task_stats(obj).in_progress
 
     def get_total_tasks_failed(self, obj):
-        return obj.tasks.filter(status='failed').count()
+        return self.get_task_stats(obj).failed
 
     def get_completion_percentage(self, obj):
-        total_tasks = obj.tasks.count()
+        stats = self.get_task_stats(obj)
+        total_tasks = stats.total
         if total_tasks == 0:
             return 0
-        completed_tasks = obj.tasks.filter(status='completed').count()
-        return (completed_tasks / total_tasks) * 100
-
+        return (stats.completed / total_tasks) * 100
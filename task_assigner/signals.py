@@ -0,0 +1,40 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from task_assigner.blacklist import remember_blacklisted
+from task_assigner.models import User
+from utils.authentication import forget_cached_user
+from utils.cache import invalidate_cached_responses
+
+
+def forget_user_on_commit(instance, using):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    transaction.on_commit(partial(forget_cached_user, user_id), using=using)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    forget_user_on_commit(instance, kwargs.get('using'))
+    # Logins only touch last_login, which no cached response includes.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_cached_responses(User, using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_user_on_commit(instance, kwargs.get('using'))
+    invalidate_cached_responses(User, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    # Added right away rather than on commit, a rolled back blacklisting only
+    # leaves a harmless false positive in the filter.
+    if created:
+        remember_blacklisted(instance.token.jti, instance.token.expires_at)
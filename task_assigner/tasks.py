@@ -1,9 +1,88 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+import redis
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.utils.log import get_task_logger
 
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
 from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .assignment import assign_unassigned_tasks
+from .blacklist import get_blacklist_filter
+from .models import ArchivedTask, Task, UserTaskStats
+from .models.enums import ACTIVE_TASK_STATUSES, TERMINAL_TASK_STATUSES, TaskStatus
+from .partitions import create_task_partitions
+
+logger = get_task_logger(__name__)
+
+
+def fail_overdue_tasks(queryset, batch_size):
+    """
+    Fails up to `batch_size` tasks of `queryset`, earliest deadline first,
+    and returns their ids.
+
+    Rows are locked with SKIP LOCKED, so overlapping runs and concurrent
+    writers never wait on each other, and the batch is written with a single
+    UPDATE instead of one save() per task.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(status__in=ACTIVE_TASK_STATUSES, completed_at=None)
+            .order_by('deadline')
+            .select_for_update(skip_locked=True)
+            .values_list('id', 'assigned_to_id', 'status')[:batch_size]
+        )
+        if not rows:
+            return []
+
+        task_ids = [task_id for task_id, _, _ in rows]
+        Task.objects.filter(pk__in=task_ids).update(
+            status=TaskStatus.FAILED,
+            updated_at=timezone.now(),
+        )
+        deltas = Counter()
+        for _, user_id, status in rows:
+            deltas[(user_id, status)] -= 1
+            deltas[(user_id, TaskStatus.FAILED)] += 1
+        UserTaskStats.apply_deltas(deltas)
+    return task_ids
+
+
+def expire_task_batch(now, batch_size):
+    """
+    Fails one bounded batch of tasks whose deadline passed before `now` and
+    returns how many were expired.
+    """
+    return len(fail_overdue_tasks(Task.objects.filter(deadline__lt=now), batch_size))
 
-from .models import Task
-from .models.enums import TaskStatus
+
+def expire_scheduled_tasks(scheduler, now, task_ids, retry_at):
+    """
+    Fails the tasks the deadline scheduler popped as due at `now` and
+    returns how many were expired.
+
+    The scheduler pops deadlines at or before `now`, so those are matched
+    inclusively. Popped tasks that are still active but were not expired,
+    because another transaction holds their row or their deadline moved,
+    are registered again: locked ones to be retried at `retry_at`, the
+    others at their current deadline.
+    """
+    expired = fail_overdue_tasks(Task.objects.filter(pk__in=task_ids, deadline__lte=now), len(task_ids))
+    remaining = set(task_ids).difference(expired)
+    if remaining:
+        deadlines = (
+            Task.objects.filter(pk__in=remaining, status__in=ACTIVE_TASK_STATUSES, completed_at=None)
+            .exclude(deadline=None)
+            .values_list('id', 'deadline')
+        )
+        scheduler.schedule({task_id: max(deadline, retry_at) for task_id, deadline in deadlines})
+    return len(expired)
 
 
 @shared_task
@@ -11,14 +90,174 @@ def expire_tasks():
     """
     Task to expire tasks that are past their deadline.
     """
-    expired_tasks = Task.objects.filter(
-        deadline__lt=timezone.now(),
-        status__in=[TaskStatus.UNASSIGNED, TaskStatus.PENDING, TaskStatus.IN_PROGRESS],
-        completed_at=None,
-    )
+    now = timezone.now()
+    batch_size = settings.TASK_EXPIRY_BATCH_SIZE
+    expired = 0
+    try:
+        while True:
+            started = time.monotonic()
+            count = expire_task_batch(now, batch_size)
+            expired += count
+            if count:
+                logger.info(
+                    "Expired batch of %d tasks in %.1f ms.", count, (time.monotonic() - started) * 1000
+                )
+            if count < batch_size:
+                break
+    except SoftTimeLimitExceeded:
+        # Committed batches are kept, the next run picks up the rest.
+        logger.warning("Soft time limit reached after expiring %d tasks.", expired)
+    return f"Expired {expired} tasks."
+
+
+def archive_task_batch(cutoff, batch_size):
+    """
+    Moves one bounded batch of completed and failed tasks last changed before
+    `cutoff` into the archive and returns how many were moved. Rows are locked
+    with SKIP LOCKED, so a task being edited is simply left for the next run.
+    """
+    with transaction.atomic():
+        task_ids = list(
+            Task.objects.filter(status__in=TERMINAL_TASK_STATUSES, updated_at__lt=cutoff)
+            .order_by('updated_at')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not task_ids:
+            return 0
+        return ArchivedTask.archive(task_ids)
+
+
+@shared_task
+def archive_tasks():
+    """
+    Task to move old completed and failed tasks out of the task table.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.TASK_ARCHIVE_AFTER_DAYS)
+    batch_size = settings.TASK_ARCHIVE_BATCH_SIZE
+    archived = 0
+    try:
+        while True:
+            started = time.monotonic()
+            count = archive_task_batch(cutoff, batch_size)
+            archived += count
+            if count:
+                logger.info(
+                    "Archived batch of %d tasks in %.1f ms.", count, (time.monotonic() - started) * 1000
+                )
+            if count < batch_size:
+                break
+    except SoftTimeLimitExceeded:
+        logger.warning("Soft time limit reached after archiving %d tasks.", archived)
+    return f"Archived {archived} tasks."
 
-    for task in expired_tasks:
-        task.status = TaskStatus.FAILED
-        task.save()
-    return f"Expired {expired_tasks.count()} tasks."
 
+def purge_token_batch(now, batch_size):
+    """
+    Deletes one bounded batch of expired outstanding tokens, and with them
+    their blacklist rows, and returns how many tokens were deleted. Rows are
+    found through outstanding_token_expires_idx and locked with SKIP LOCKED,
+    so tokens being refreshed are left for the next run.
+    """
+    with transaction.atomic():
+        token_ids = list(
+            OutstandingToken.objects.filter(expires_at__lt=now)
+            .order_by('expires_at')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not token_ids:
+            return 0
+        # Plain DELETEs, the ORM cascade would first load every token row.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {BlacklistedToken._meta.db_table} WHERE token_id = ANY(%s)', [token_ids]
+            )
+            cursor.execute(f'DELETE FROM {OutstandingToken._meta.db_table} WHERE id = ANY(%s)', [token_ids])
+    return len(token_ids)
+
+
+@shared_task
+def purge_expired_tokens():
+    """
+    Task to delete expired JWTs from the token blacklist tables and refresh
+    the blacklist filters.
+    """
+    now = timezone.now()
+    batch_size = settings.TOKEN_PURGE_BATCH_SIZE
+    purged = 0
+    try:
+        while True:
+            started = time.monotonic()
+            count = purge_token_batch(now, batch_size)
+            purged += count
+            if count:
+                logger.info(
+                    "Purged batch of %d expired tokens in %.1f ms.", count, (time.monotonic() - started) * 1000
+                )
+            if count < batch_size:
+                break
+    except SoftTimeLimitExceeded:
+        logger.warning("Soft time limit reached after purging %d tokens.", purged)
+        return f"Purged {purged} expired tokens."
+
+    if settings.TOKEN_BLACKLIST_FILTER_ENABLED:
+        try:
+            blacklist_filter = get_blacklist_filter()
+            blacklist_filter.drop_expired(now)
+            if blacklist_filter.seed(batch_size):
+                logger.info("Seeded the token blacklist filter.")
+        except redis.RedisError:
+            logger.warning("Could not refresh the token blacklist filter.", exc_info=True)
+    return f"Purged {purged} expired tokens."
+
+
+@shared_task
+def ensure_task_partitions():
+    """
+    Task to create the task table partitions of the coming months.
+    """
+    created = create_task_partitions(settings.TASK_PARTITION_MONTHS_AHEAD)
+    if created:
+        logger.info("Created task partitions %s.", ", ".join(created))
+    return f"Created {len(created)} task partitions."
+
+
+@shared_task
+def reconcile_user_task_stats():
+    """
+    Task to repair drift between `UserTaskStats` and the task table.
+    """
+    actual = {}
+    for model in (Task, ArchivedTask):
+        rows = (
+            model.objects.exclude(assigned_to=None)
+            .values_list('assigned_to', 'status')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        for user_id, status, total in rows:
+            counts = actual.setdefault(user_id, {})
+            counts[status] = counts.get(status, 0) + total
+
+    drifted = set()
+    for stats in UserTaskStats.objects.all().iterator():
+        counts = actual.pop(stats.user_id, {})
+        if any(getattr(stats, status) != counts.get(status, 0) for status in TaskStatus.values):
+            drifted.add(stats.user_id)
+    drifted.update(actual)
+
+    for user_id in drifted:
+        UserTaskStats.recount(user_id)
+    return f"Reconciled task stats for {len(drifted)} users."
+
+
+@shared_task
+def auto_assign_tasks(limit=None):
+    """
+    Task to hand unassigned tasks to the least-loaded users.
+    """
+    started = time.monotonic()
+    assigned = assign_unassigned_tasks(limit=limit)
+    logger.info("Assigned %d tasks in %.1f ms.", assigned, (time.monotonic() - started) * 1000)
+    return f"Assigned {assigned} tasks."
@@ -1,3 +1,1650 @@
-from django.test import TestCase
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from uuid import uuid4
 
-# Create your tests here.
+import fakeredis
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from redis import RedisError
+from rest_framework_simplejwt import settings as jwt_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from task_assigner.assignment import assign_unassigned_tasks, claim_tasks
+from task_assigner.blacklist import BlacklistFilter, FilteredRefreshToken
+from task_assigner.celery import deferred_db_pool_options, restore_worker_db_pool, size_worker_db_pool
+from task_assigner.models import ArchivedTask, Task, User, UserTaskStats
+from task_assigner.models.enums import ACTIVE_TASK_STATUSES, TaskStatus, TaskType
+from task_assigner.permissions import IsAssignedToTask
+from task_assigner.partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    create_task_partitions,
+    month_start,
+    partition_name,
+)
+from task_assigner.scheduler import DeadlineScheduler, schedule_task_deadline
+from task_assigner.tasks import (
+    archive_tasks,
+    expire_scheduled_tasks,
+    expire_task_batch,
+    expire_tasks,
+    purge_token_batch,
+)
+from task_assigner.views.tasks import TaskFilter, TaskViewSet
+from task_assigner.views.users import UserViewSet
+from utils.cache import GENERATION_KEY
+from utils.hashers import get_password_hashers
+from utils.authentication import USER_CACHE_KEY, CachedJWTAuthentication, forget_cached_user, local_users
+from utils.metrics import STATUS_CACHE_KEY
+from utils.replicas import PrimaryReplicaRouter, current_replica
+from utils.testing import QueryBudgetMixin
+
+
+class TaskFilterIndexTests(TestCase):
+    """
+    Checks on a seeded table that the filtered task list queries are
+    answered by the composite and partial indexes instead of a seq scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User(email=f"user{i}@example.com", name=f"user {i}", password="!")
+            for i in range(50)
+        ]
+        User.objects.bulk_create(cls.users)
+
+        now = timezone.now()
+        tasks = []
+        for i in range(20000):
+            # Mostly finished history with a thin slice of live work.
+            status = TaskStatus.COMPLETED if i % 50 else TaskStatus.PENDING
+            tasks.append(Task(
+                name=f"task {i}",
+                description=f"Routine check number {i} of the weekly rotation, see the runbook.",
+                assigned_to=cls.users[i % len(cls.users)],
+                status=status,
+                type=TaskType.LOW if i % 97 == 0 else TaskType.NORMAL,
+                deadline=now + timedelta(minutes=i - 10000),
+            ))
+        Task.objects.bulk_create(tasks, batch_size=5000)
+
+        with connection.cursor() as cursor:
+            # Autovacuum would normally merge the GIN pending lists.
+            for name in cls.partition_indexes('task_search_vector_idx'):
+                cursor.execute("SELECT gin_clean_pending_list(%s::regclass)", [name])
+            cursor.execute("ANALYZE task_assigner_task")
+            cursor.execute("ANALYZE task_assigner_user")
+
+    @staticmethod
+    def partition_indexes(index_name):
+        """
+        Returns the per-partition indexes of a task table index, the names
+        that show up in query plans.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass",
+                [index_name],
+            )
+            return [name for name, in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        with connection.cursor() as cursor:
+            # Empty partitions are always seq scanned, only seeded ones matter.
+            cursor.execute("SELECT DISTINCT tableoid::regclass::text FROM task_assigner_task")
+            for partition, in cursor.fetchall():
+                self.assertNotIn(f'Seq Scan on {partition} ', plan)
+        self.assertTrue(
+            any(name in plan for name in self.partition_indexes(index_name)),
+            f"{index_name} not used in:\n{plan}",
+        )
+
+    def test_assignee_and_status_filter_uses_composite_index(self):
+        data = {'assigned_to': str(self.users[3].external_id), 'status': 'completed'}
+        queryset = TaskFilter(data, queryset=Task.objects.all()).qs
+        self.assertUsesIndex(queryset, 'task_assignee_status_dl_idx')
+
+    def test_status_and_type_filter_uses_composite_index(self):
+        data = {'status': 'completed', 'type': 'low'}
+        queryset = TaskFilter(data, queryset=Task.objects.all()).qs
+        self.assertUsesIndex(queryset, 'task_status_type_created_idx')
+
+    def test_overdue_active_tasks_use_partial_index(self):
+        queryset = Task.objects.filter(status__in=ACTIVE_TASK_STATUSES, deadline__lt=timezone.now())
+        self.assertUsesIndex(queryset, 'task_active_deadline_idx')
+
+    def test_text_search_uses_gin_index(self):
+        queryset = TaskFilter({'q': 'task 12345'}, queryset=Task.objects.all()).qs
+        self.assertUsesIndex(queryset, 'task_search_vector_idx')
+        self.assertEqual([task.name for task in queryset], ['task 12345'])
+
+        queryset = TaskFilter({'q': '1234', 'search_mode': 'prefix'}, queryset=Task.objects.all()).qs
+        self.assertUsesIndex(queryset, 'task_search_vector_idx')
+        self.assertEqual(queryset.count(), 11)
+
+    def test_created_at_bounds_prune_partitions(self):
+        month = month_start(timezone.now())
+        data = {'created_after': month.isoformat(), 'created_before': add_months(month, 1).isoformat()}
+        plan = TaskFilter(data, queryset=Task.objects.all()).qs.explain()
+        self.assertIn(partition_name(month), plan)
+        self.assertNotIn(partition_name(add_months(month, 1)), plan)
+        self.assertNotIn('task_assigner_task_default', plan)
+
+    def test_enum_filters_are_exact_and_validated(self):
+        filterset = TaskFilter({'status': 'pending'}, queryset=Task.objects.all())
+        self.assertNotIn('UPPER', str(filterset.qs.query))
+
+        filterset = TaskFilter({'status': 'PENDING'}, queryset=Task.objects.all())
+        self.assertFalse(filterset.is_valid())
+
+
+class TaskPartitionTests(TestCase):
+    """
+    Checks that creating the partition of a month moves the rows the default
+    partition holds for it.
+    """
+
+    def count_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{table}"')
+            return cursor.fetchone()[0]
+
+    def test_rows_move_out_of_default_partition(self):
+        month = add_months(month_start(timezone.now()), -18)
+        task = Task.objects.create(name="old task")
+        Task.objects.filter(pk=task.pk).update(created_at=month + timedelta(days=9))
+        self.assertEqual(self.count_rows(DEFAULT_PARTITION), 1)
+
+        self.assertEqual(create_task_partitions(1, start=month), [partition_name(month), partition_name(add_months(month, 1))])
+        self.assertEqual(self.count_rows(DEFAULT_PARTITION), 0)
+        self.assertEqual(self.count_rows(partition_name(month)), 1)
+        self.assertEqual(Task.objects.get(external_id=task.external_id).name, "old task")
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_indexes WHERE tablename = %s', [partition_name(month)])
+            self.assertGreater(cursor.fetchone()[0], 1)
+
+        self.assertEqual(create_task_partitions(1, start=month), [])
+
+    def test_external_id_stays_unique_across_partitions(self):
+        task = Task.objects.create(name="task")
+        archived = Task.objects.create(name="archived", status=TaskStatus.COMPLETED)
+        ArchivedTask.archive([archived.pk])
+
+        for external_id in (task.external_id, archived.external_id):
+            with self.subTest(external_id=external_id):
+                with self.assertRaises(IntegrityError):
+                    Task.objects.create(name="copy", external_id=external_id)
+                with self.assertRaises(IntegrityError):
+                    Task.objects.bulk_create([Task(name="copy", external_id=external_id)])
+
+        external_id = uuid4()
+        with self.assertRaises(IntegrityError):
+            Task.objects.bulk_create([Task(name="a", external_id=external_id), Task(name="b", external_id=external_id)])
+        self.assertEqual(Task.objects.count(), 1)
+
+
+class TokenPurgeTests(TestCase):
+    """
+    Checks that expired JWTs are found through the expires_at index and
+    purged in bounded batches together with their blacklist rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(
+                jti=f"jti-{i}",
+                token="token",
+                created_at=now,
+                # A thin expired slice among mostly live tokens.
+                expires_at=now + timedelta(minutes=-1 - i if i < 300 else i),
+            )
+            for i in range(20000)
+        ], batch_size=5000)
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens[::2]])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE token_blacklist_outstandingtoken")
+
+    def test_expired_tokens_use_expires_index(self):
+        plan = OutstandingToken.objects.filter(expires_at__lt=timezone.now()).order_by('expires_at').explain()
+        self.assertIn('outstanding_token_expires_idx', plan)
+
+    def test_purge_deletes_expired_tokens_in_batches(self):
+        now = timezone.now()
+        self.assertEqual(purge_token_batch(now, 200), 200)
+        self.assertEqual(purge_token_batch(now, 200), 100)
+        self.assertEqual(purge_token_batch(now, 200), 0)
+
+        self.assertFalse(OutstandingToken.objects.filter(expires_at__lt=now).exists())
+        self.assertEqual(OutstandingToken.objects.count(), 19700)
+        self.assertEqual(BlacklistedToken.objects.count(), 9850)
+
+
+# Counts the queries run on the primary.
+@override_settings(DATABASE_REPLICAS=[])
+class DetailQueryCountTests(TestCase):
+    """
+    Checks that detail actions load their row, with its assignee and
+    counters, in a single query shared by permissions and the action.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="assignee@example.com", name="assignee", password="!")
+        cls.other = User.objects.create_user(email="other@example.com", name="other", password="!")
+        cls.task = Task.objects.create(
+            name="task", assigned_to=cls.user, status=TaskStatus.PENDING, type=TaskType.NORMAL,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def selected_tables(self, queries):
+        """
+        Returns the table each SELECT reads from, in order.
+        """
+        return [
+            query['sql'].split(' FROM ', 1)[1].split()[0].strip('"')
+            for query in queries.captured_queries if query['sql'].startswith('SELECT')
+        ]
+
+    def test_task_retrieve_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/v1/tasks/{self.task.external_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned_to']['email'], self.user.email)
+
+    def test_task_partial_update_loads_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/v1/tasks/{self.task.external_id}', {'name': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.selected_tables(queries), ['task_assigner_task'])
+
+    def test_complete_task_loads_once_with_permission(self):
+        view = TaskViewSet.as_view({'post': 'complete_task'}, permission_classes=[IsAssignedToTask])
+        request = APIRequestFactory().post(f'/v1/tasks/{self.task.external_id}/complete_task')
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, external_id=str(self.task.external_id))
+        self.assertEqual(response.status_code, 200)
+        # The counters changed with the status, so only they are read again.
+        self.assertEqual(self.selected_tables(queries), ['task_assigner_task', 'task_assigner_usertaskstats'])
+        self.assertEqual(response.data['task']['assigned_to']['total_tasks_completed'], 1)
+
+    def test_complete_task_denied_without_extra_queries(self):
+        view = TaskViewSet.as_view({'post': 'complete_task'}, permission_classes=[IsAssignedToTask])
+        request = APIRequestFactory().post(f'/v1/tasks/{self.task.external_id}/complete_task')
+        force_authenticate(request, self.other)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, external_id=str(self.task.external_id))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.selected_tables(queries), ['task_assigner_task'])
+
+    def test_user_retrieve_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/v1/users/{self.user.external_id}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_partial_update_loads_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/v1/users/{self.user.external_id}', {'name': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.selected_tables(queries), ['task_assigner_user'])
+
+
+# The async views read from the primary.
+@override_settings(DATABASE_REPLICAS=[])
+class AsyncTaskReadTests(TestCase):
+    """
+    Checks that the async task endpoints answer like their TaskViewSet
+    counterparts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="async@example.com", name="async", password="!")
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(
+                name=f"task {i}",
+                assigned_to=cls.user if i % 3 else None,
+                status=TaskStatus.PENDING if i % 3 else TaskStatus.UNASSIGNED,
+                type=TaskType.URGENT if i % 4 == 0 else TaskType.NORMAL,
+                deadline=now + timedelta(hours=i) if i % 5 else None,
+            )
+            for i in range(40)
+        ])
+
+    def assertSameResponse(self, path, query=''):
+        sync = self.client.get(f'/v1/tasks{path}{query}')
+        async_ = self.client.get(f'/v1/async/tasks{path}{query}')
+        self.assertEqual(async_.status_code, sync.status_code)
+        self.assertEqual(async_.json(), sync.json())
+        return async_.json()
+
+    def test_list_filters_and_offset_pagination(self):
+        self.assertSameResponse('', '?limit=7&offset=14')
+        data = self.assertSameResponse('', f'?status=pending&type=urgent&assigned_to={self.user.external_id}')
+        self.assertTrue(data['results'])
+        self.assertSameResponse('', '?order_by=-deadline&limit=5')
+        self.assertSameResponse('', '?status=PENDING')
+
+    def test_list_cursor_pagination(self):
+        query = '?pagination=cursor&order_by=-deadline&limit=6&with_count=true'
+        for _ in range(3):
+            data = self.assertSameResponse('', query)
+            query = f"?cursor={data['next']}&order_by=-deadline&limit=6"
+        self.assertSameResponse('', '?cursor=garbage')
+
+    def test_retrieve(self):
+        task = Task.objects.first()
+        self.assertSameResponse(f'/{task.external_id}')
+        self.assertEqual(self.client.get(f'/v1/async/tasks/{uuid4()}').status_code, 404)
+
+
+class TaskExportTests(TestCase):
+    """
+    Checks that exports are streamed chunk by chunk under WSGI and ASGI.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Task.objects.bulk_create([Task(name=f"task {i}") for i in range(25)])
+
+    def read_lines(self, content):
+        return b''.join(content).decode().splitlines()
+
+    @mock.patch('utils.export.ROWS_PER_CHUNK', 10)
+    def test_wsgi_export_streams_sync_iterator(self):
+        response = self.client.get('/v1/tasks/export?export_format=csv')
+        self.assertFalse(response.is_async)
+        lines = self.read_lines(response.streaming_content)
+        self.assertEqual(len(lines), 26)
+        self.assertTrue(lines[0].startswith('external_id,name,'))
+
+    @mock.patch('utils.export.ROWS_PER_CHUNK', 10)
+    async def test_asgi_export_streams_async_iterator(self):
+        response = await self.async_client.get('/v1/tasks/export')
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(self.read_lines(chunks)), 25)
+
+
+class TaskArchiveTests(TestCase):
+    """
+    Checks the archive job and the retrieve fallback to the archive.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="archive@example.com", name="archive", password="!")
+        cls.old = [
+            Task.objects.create(name=f"old {status}", assigned_to=cls.user, status=status)
+            for status in (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.COMPLETED)
+        ]
+        cls.active = Task.objects.create(name="active", assigned_to=cls.user, status=TaskStatus.PENDING)
+        cls.recent = Task.objects.create(name="recent", assigned_to=cls.user, status=TaskStatus.COMPLETED)
+        cls.deleted = cls.old[2]
+        Task.objects.filter(pk=cls.deleted.pk).update(deleted=True)
+        Task.objects.exclude(pk=cls.recent.pk).update(updated_at=timezone.now() - timedelta(days=60))
+
+    @override_settings(TASK_ARCHIVE_BATCH_SIZE=2)
+    def test_archive_moves_old_terminal_tasks_in_batches(self):
+        stats = UserTaskStats.recount(self.user.id)
+        self.assertEqual(archive_tasks(), "Archived 3 tasks.")
+
+        self.assertEqual(set(Task.objects.values_list('id', flat=True)), {self.active.id, self.recent.id})
+        self.assertEqual(
+            dict(ArchivedTask.objects.values_list('id', 'deleted')),
+            {task.id: task.id == self.deleted.id for task in self.old},
+        )
+        self.assertEqual(UserTaskStats.recount(self.user.id).completed, stats.completed)
+        self.assertEqual(archive_tasks(), "Archived 0 tasks.")
+
+    def test_retrieve_falls_back_to_archive(self):
+        archive_tasks()
+        for prefix in ('/v1/tasks', '/v1/async/tasks'):
+            response = self.client.get(f'{prefix}/{self.old[0].external_id}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['name'], self.old[0].name)
+
+            self.assertEqual(self.client.get(f'{prefix}/{self.deleted.external_id}').status_code, 404)
+            self.assertEqual(self.client.get(f'{prefix}/{self.active.external_id}').status_code, 200)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True, DATABASE_REPLICAS=[])
+class ResponseCacheTests(TestCase):
+    """
+    Checks the list/retrieve response cache, its invalidation by task writes
+    and the hit and miss counters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="cache@example.com", name="cache", password="!")
+        cls.task = Task.objects.create(name="cached", status=TaskStatus.UNASSIGNED)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCached(self, path, outcome):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], outcome)
+        return response.json()
+
+    def test_list_and_retrieve_are_served_from_cache(self):
+        for path in ('/v1/tasks?limit=5', f'/v1/tasks/{self.task.external_id}', f'/v1/users/{self.user.external_id}'):
+            data = self.assertCached(path, 'MISS')
+            with self.assertNumQueries(0):
+                self.assertEqual(self.assertCached(path, 'HIT'), data)
+        self.assertCached('/v1/tasks?limit=6', 'MISS')
+
+    def test_task_writes_bump_generation(self):
+        def write_and_check(write):
+            self.client.get('/v1/tasks')
+            self.assertCached('/v1/tasks', 'HIT')
+            generation = cache.get(GENERATION_KEY.format(label=Task._meta.label), 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertGreater(cache.get(GENERATION_KEY.format(label=Task._meta.label)), generation)
+            return self.assertCached('/v1/tasks', 'MISS')['results'][0]
+
+        task = write_and_check(lambda: self.client.post('/v1/tasks/assign_task', {
+            'user_id': str(self.user.external_id),
+            'task_id': str(self.task.external_id),
+        }, content_type='application/json'))
+        self.assertEqual(task['status'], TaskStatus.PENDING)
+
+        task = write_and_check(lambda: self.client.post(f'/v1/tasks/{self.task.external_id}/complete_task'))
+        self.assertEqual(task['status'], TaskStatus.COMPLETED)
+
+        Task.objects.filter(pk=self.task.pk).update(
+            status=TaskStatus.PENDING, completed_at=None, deadline=timezone.now() - timedelta(hours=1),
+        )
+        task = write_and_check(expire_tasks)
+        self.assertEqual(task['status'], TaskStatus.FAILED)
+
+    def test_stats_endpoint_counts_hits_and_misses(self):
+        admin = User.objects.create_superuser(email="admin@example.com", name="admin", password="!")
+        self.assertCached('/v1/tasks', 'MISS')
+        self.assertCached('/v1/tasks', 'HIT')
+        self.assertCached('/v1/tasks', 'HIT')
+
+        self.assertEqual(self.client.get('/v1/cache/stats').status_code, 401)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/v1/cache/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tasks'], {'hits': 2, 'misses': 1, 'hit_ratio': 0.6667})
+        self.assertEqual(response.data['users'], {'hits': 0, 'misses': 0, 'hit_ratio': None})
+
+
+class TaskCounterTestMixin:
+    def counts(self, user):
+        stats = UserTaskStats.objects.filter(user=user).values(*TaskStatus.values).first() or {}
+        return {status: count for status, count in stats.items() if count}
+
+    def assertCountsMatchTasks(self, *users):
+        for user in users:
+            actual = Counter(Task.objects.filter(assigned_to=user).values_list('status', flat=True))
+            self.assertEqual(self.counts(user), dict(actual))
+
+
+class TaskCounterTests(TaskCounterTestMixin, TestCase):
+    """
+    Checks that UserTaskStats follows task saves and deletes, including
+    saves of tasks loaded with only some of their fields.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(email="alice@example.com", name="alice", password="!")
+        cls.bob = User.objects.create_user(email="bob@example.com", name="bob", password="!")
+
+    def test_saves_and_deletes_move_counters(self):
+        task = Task.objects.create(name="task", assigned_to=self.alice, status=TaskStatus.PENDING)
+        self.assertEqual(self.counts(self.alice), {'pending': 1})
+
+        task.status = TaskStatus.IN_PROGRESS
+        task.save()
+        self.assertEqual(self.counts(self.alice), {'in_progress': 1})
+
+        task.assigned_to = self.bob
+        task.save()
+        self.assertEqual((self.counts(self.alice), self.counts(self.bob)), ({}, {'in_progress': 1}))
+
+        task.delete()
+        self.assertEqual(self.counts(self.bob), {})
+
+    def test_queryset_deletes_move_counters(self):
+        for user, status in [(self.alice, TaskStatus.PENDING), (self.alice, TaskStatus.PENDING),
+                             (self.alice, TaskStatus.COMPLETED), (self.bob, TaskStatus.IN_PROGRESS), (None, TaskStatus.UNASSIGNED)]:
+            Task.objects.create(name="task", assigned_to=user, status=status)
+
+        with self.assertNumQueries(6):
+            deleted, _ = Task.objects.filter(name="task").exclude(status=TaskStatus.COMPLETED).delete()
+        self.assertEqual(deleted, 4)
+        self.assertEqual((self.counts(self.alice), self.counts(self.bob)), ({'completed': 1}, {}))
+        self.assertCountsMatchTasks(self.alice, self.bob)
+
+    def test_partially_loaded_tasks_move_counters(self):
+        task = Task.objects.create(name="task", assigned_to=self.alice, status=TaskStatus.PENDING)
+
+        partial = Task.objects.only('id', 'name').get(pk=task.pk)
+        partial.status = TaskStatus.COMPLETED
+        partial.save()
+        self.assertEqual(self.counts(self.alice), {'completed': 1})
+
+        partial = Task.objects.only('id', 'status').get(pk=task.pk)
+        partial.assigned_to = self.bob
+        partial.save()
+        self.assertCountsMatchTasks(self.alice, self.bob)
+        self.assertEqual(self.counts(self.bob), {'completed': 1})
+
+        partial = Task.objects.only('id', 'name').get(pk=task.pk)
+        partial.deadline = timezone.now() + timedelta(days=1)
+        partial.status = TaskStatus.PENDING
+        with self.captureOnCommitCallbacks() as callbacks:
+            partial.save()
+        self.assertEqual(self.counts(self.bob), {'pending': 1})
+        self.assertTrue(any(getattr(callback, 'func', None) is schedule_task_deadline for callback in callbacks))
+
+    def test_untracked_fields_skip_the_stored_keys(self):
+        task = Task.objects.create(name="task", assigned_to=self.alice, status=TaskStatus.PENDING)
+        partial = Task.objects.only('id', 'name').get(pk=task.pk)
+        partial.name = "renamed"
+        with CaptureQueriesContext(connection) as queries:
+            partial.save()
+        self.assertFalse([query for query in queries if 'FOR UPDATE' in query['sql']])
+        self.assertEqual(self.counts(self.alice), {'pending': 1})
+
+
+class SeedLoadTests(TaskCounterTestMixin, TestCase):
+    """
+    Checks that seed_load writes the requested rows over the past days and
+    leaves the counters it bypasses consistent.
+    """
+
+    def test_seeds_users_and_tasks(self):
+        out = StringIO()
+        call_command('seed_load', users=4, admins=1, tasks=60, days=40, batch_size=25, seed=7, stdout=out)
+        self.assertIn("Seeded 4 users and 60 tasks", out.getvalue())
+
+        users = list(User.objects.filter(email__startswith='load-').order_by('id'))
+        self.assertEqual(len(users), 4)
+        self.assertEqual([user.is_admin for user in users], [True, False, False, False])
+        self.assertTrue(users[-1].check_password('load-password'))
+
+        tasks = Task.objects.all()
+        self.assertEqual(tasks.count(), 60)
+        self.assertEqual(tasks.values('external_id').distinct().count(), 60)
+        self.assertFalse(tasks.filter(status=TaskStatus.UNASSIGNED).exclude(assigned_to=None).exists())
+        self.assertFalse(tasks.exclude(status=TaskStatus.UNASSIGNED).filter(assigned_to=None).exists())
+        self.assertFalse(tasks.filter(created_at__lt=timezone.now() - timedelta(days=40)).exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{DEFAULT_PARTITION}"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertCountsMatchTasks(*users)
+        self.assertEqual(
+            sum(stats.total for stats in UserTaskStats.objects.filter(user__in=users)),
+            tasks.exclude(assigned_to=None).count(),
+        )
+
+
+class TaskCursorPaginationTests(TestCase):
+    """
+    Walks every page of the keyset pagination forwards and backwards over
+    duplicated and NULL deadlines.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        hours = [None, 0, 1, None, 0, 2, None, 1, 0, None, 3]
+        Task.objects.bulk_create([
+            Task(name=f"task {i}", deadline=now + timedelta(hours=hour) if hour is not None else None)
+            for i, hour in enumerate(hours)
+        ])
+        cls.tasks = list(Task.objects.values_list('id', 'external_id', 'deadline'))
+
+    def walk(self, order_by, direction):
+        pages, query = [], f'?pagination=cursor&order_by={order_by}&limit=3'
+        while query:
+            data = self.client.get(f'/v1/tasks{query}').json()
+            pages.append([task['external_id'] for task in data['results']])
+            cursor = data[direction]
+            query = cursor and f'?cursor={cursor}&order_by={order_by}&limit=3'
+        return pages, data
+
+    def assertRoundTrip(self, order_by, expected):
+        expected = [str(external_id) for _, external_id, _ in expected]
+        pages, last = self.walk(order_by, 'next')
+        self.assertEqual([task for page in pages for task in page], expected)
+        self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+
+        back, query = [], f"?cursor={last['previous']}&order_by={order_by}&limit=3"
+        while query:
+            data = self.client.get(f'/v1/tasks{query}').json()
+            back.insert(0, [task['external_id'] for task in data['results']])
+            query = data['previous'] and f"?cursor={data['previous']}&order_by={order_by}&limit=3"
+        self.assertEqual(back, pages[:-1])
+
+    def test_ascending_deadlines_with_nulls_last(self):
+        self.assertRoundTrip('deadline', sorted(self.tasks, key=lambda task: (task[2] is None, task[2] or 0, task[0])))
+
+    def test_descending_deadlines_with_nulls_last(self):
+        self.assertRoundTrip('-deadline', sorted(
+            self.tasks,
+            key=lambda task: (task[2] is None, -task[2].timestamp() if task[2] else 0, -task[0]),
+        ))
+
+
+class TaskExpiryTests(TaskCounterTestMixin, TestCase):
+    @override_settings(TASK_EXPIRY_BATCH_SIZE=2)
+    def test_expire_tasks_fails_overdue_tasks_in_batches(self):
+        user = User.objects.create_user(email="expiry@example.com", name="expiry", password="!")
+        now = timezone.now()
+        overdue = [
+            Task.objects.create(
+                name=f"overdue {i}",
+                assigned_to=user,
+                status=TaskStatus.PENDING if i % 2 else TaskStatus.IN_PROGRESS,
+                deadline=now - timedelta(minutes=i + 1),
+            )
+            for i in range(5)
+        ]
+        Task.objects.create(name="future", assigned_to=user, status=TaskStatus.PENDING, deadline=now + timedelta(hours=1))
+        Task.objects.create(
+            name="done", assigned_to=user, status=TaskStatus.COMPLETED,
+            completed_at=now - timedelta(hours=2), deadline=now - timedelta(hours=3),
+        )
+        Task.objects.create(name="open", assigned_to=user, status=TaskStatus.PENDING)
+
+        self.assertEqual(expire_tasks(), "Expired 5 tasks.")
+        self.assertEqual(
+            set(Task.objects.filter(status=TaskStatus.FAILED).values_list('id', flat=True)),
+            {task.id for task in overdue},
+        )
+        self.assertEqual(self.counts(user), {'failed': 5, 'pending': 2, 'completed': 1})
+        self.assertCountsMatchTasks(user)
+        self.assertEqual(expire_tasks(), "Expired 0 tasks.")
+
+
+class TaskAssignmentTests(TaskCounterTestMixin, TestCase):
+    """
+    Checks that tasks are handed out in priority order to the least-loaded
+    users that can receive work.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.busy, cls.first, cls.second, cls.inactive, cls.deleted = [
+            User.objects.create_user(email=f"{name}@example.com", name=name, password="!")
+            for name in ('busy', 'first', 'second', 'inactive', 'deleted')
+        ]
+        User.objects.filter(pk=cls.inactive.pk).update(is_active=False)
+        User.objects.filter(pk=cls.deleted.pk).update(deleted=True)
+        for i in range(2):
+            Task.objects.create(name=f"busy {i}", assigned_to=cls.busy, status=TaskStatus.PENDING)
+
+        now = timezone.now()
+        specs = [
+            ('low', TaskType.LOW, None),
+            ('normal later', TaskType.NORMAL, 2),
+            ('urgent later', TaskType.URGENT, 3),
+            ('urgent soon', TaskType.URGENT, 1),
+            ('normal soon', TaskType.NORMAL, 1),
+            ('normal open', TaskType.NORMAL, None),
+            ('low soon', TaskType.LOW, 1),
+        ]
+        cls.tasks = {
+            name: Task.objects.create(
+                name=name, type=task_type, deadline=now + timedelta(hours=hours) if hours else None,
+            )
+            for name, task_type, hours in specs
+        }
+
+    def names(self, **filters):
+        return set(Task.objects.filter(**filters).values_list('name', flat=True))
+
+    def test_assigns_by_priority_to_least_loaded_users(self):
+        self.assertEqual(assign_unassigned_tasks(limit=4, batch_size=3), 4)
+
+        self.assertEqual(
+            self.names(status=TaskStatus.UNASSIGNED, assigned_to=None),
+            {'normal open', 'low soon', 'low'},
+        )
+        self.assertEqual(self.names(assigned_to=self.first), {'urgent soon', 'normal soon'})
+        self.assertEqual(self.names(assigned_to=self.second), {'urgent later', 'normal later'})
+        self.assertEqual(self.names(assigned_to__in=[self.inactive, self.deleted]), set())
+        self.assertCountsMatchTasks(self.busy, self.first, self.second)
+
+    def test_manual_assign_rejects_assigned_tasks(self):
+        task = self.tasks['urgent soon']
+        claim_tasks(self.first)
+        response = self.client.post('/v1/tasks/assign_task', {
+            'user_id': str(self.second.external_id),
+            'task_id': str(task.external_id),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.get(pk=task.pk).assigned_to_id, self.first.pk)
+
+        task = self.tasks['low']
+        response = self.client.post('/v1/tasks/assign_task', {
+            'user_id': str(self.second.external_id),
+            'task_id': str(task.external_id),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['task']['status'], TaskStatus.PENDING)
+        self.assertCountsMatchTasks(self.first, self.second)
+
+    def test_claim_takes_next_tasks_in_priority_order(self):
+        self.assertEqual(
+            claim_tasks(self.second, 3),
+            [self.tasks[name].id for name in ('urgent soon', 'urgent later', 'normal soon')],
+        )
+        self.assertEqual(self.counts(self.second), {'pending': 3})
+
+
+class ConcurrentClaimTests(TaskCounterTestMixin, TransactionTestCase):
+    """
+    Checks that concurrent claimers each get distinct tasks.
+    """
+
+    def test_concurrent_claims_get_distinct_tasks(self):
+        users = [
+            User.objects.create_user(email=f"claimer{i}@example.com", name=f"claimer {i}", password="!")
+            for i in range(4)
+        ]
+        Task.objects.bulk_create([Task(name=f"task {i}") for i in range(10)])
+        barrier = threading.Barrier(len(users))
+        claimed = {}
+
+        def claim(user):
+            try:
+                barrier.wait(10)
+                claimed[user.pk] = claim_tasks(user, 3)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        task_ids = [task_id for ids in claimed.values() for task_id in ids]
+        self.assertEqual(len(task_ids), 10)
+        self.assertEqual(len(set(task_ids)), 10)
+        for user in users:
+            self.assertEqual(
+                set(Task.objects.filter(assigned_to=user).values_list('id', flat=True)), set(claimed[user.pk]),
+            )
+        self.assertCountsMatchTasks(*users)
+
+    def test_manual_assign_waits_for_concurrent_claim(self):
+        claimer, assignee = [
+            User.objects.create_user(email=f"{name}@example.com", name=name, password="!")
+            for name in ('claimer', 'assignee')
+        ]
+        task = Task.objects.create(name="task")
+        locked, release = threading.Event(), threading.Event()
+
+        def claim():
+            try:
+                with transaction.atomic():
+                    claim_tasks(claimer)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=claim)
+        thread.start()
+        try:
+            locked.wait(10)
+            threading.Timer(0.2, release.set).start()
+            response = self.client.post('/v1/tasks/assign_task', {
+                'user_id': str(assignee.external_id),
+                'task_id': str(task.external_id),
+            }, content_type='application/json')
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'task_id': ["Task is already assigned."]})
+        self.assertEqual(Task.objects.get(pk=task.pk).assigned_to_id, claimer.pk)
+        self.assertCountsMatchTasks(claimer, assignee)
+
+
+@override_settings(DB_POOL_WORKER_MIN_SIZE=1, DB_POOL_WORKER_MAX_SIZE=2)
+class WorkerDBPoolTests(TestCase):
+    """
+    Checks that prefork workers only open connection pools in their pool
+    processes.
+    """
+
+    def setUp(self):
+        self.connections = ConnectionHandler({
+            'default': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'OPTIONS': {'pool': {'min_size': 4, 'max_size': 20, 'timeout': 5}},
+            },
+        })
+        patcher = mock.patch('django.db.connections', self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(deferred_db_pool_options.clear)
+
+    def pool_options(self):
+        return self.connections['default'].settings_dict['OPTIONS'].get('pool')
+
+    def test_prefork_pool_processes_open_their_own_pool(self):
+        size_worker_db_pool(sender=mock.Mock(pool_cls='prefork'))
+        self.assertIsNone(self.pool_options())
+        self.assertIsNone(self.connections['default'].pool)
+
+        restore_worker_db_pool()
+        self.assertEqual(self.pool_options(), {'min_size': 1, 'max_size': 2, 'timeout': 5})
+
+    def test_thread_pool_keeps_pool_in_process(self):
+        size_worker_db_pool(sender=mock.Mock(pool_cls='threads'))
+        self.assertEqual(self.pool_options(), {'min_size': 1, 'max_size': 2, 'timeout': 5})
+        self.assertEqual(deferred_db_pool_options, {})
+
+
+# A configured replica, the stand-in database added by DB_TEST_REPLICA, or
+# None when there is neither.
+REPLICA_ALIAS = next((alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS), None)
+
+
+@skipUnless(REPLICA_ALIAS, "needs DB_REPLICA_HOSTS or DB_TEST_REPLICA")
+@override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS])
+class ReplicaRoutingTests(TestCase):
+    """
+    Checks read routing against a replica test database that, unlike a real
+    replica, never receives the rows written to the primary: whatever a
+    request reads from it comes back empty.
+    """
+    databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS or DEFAULT_DB_ALIAS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="replica@example.com", name="replica", password="!")
+        cls.task = Task.objects.create(name="task", status=TaskStatus.UNASSIGNED, type=TaskType.NORMAL)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reads_go_to_a_replica(self):
+        self.assertEqual(self.client.get('/v1/tasks').data['count'], 0)
+        self.assertEqual(self.client.get(f'/v1/tasks/{self.task.external_id}').status_code, 404)
+        self.assertEqual(self.client.get(f'/v1/users/{self.user.external_id}').status_code, 404)
+        # Outside a routed request everything reads from the primary.
+        self.assertIsNone(current_replica.get())
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_writer_reads_from_primary_after_a_write(self):
+        response = self.client.post('/v1/tasks', {'name': 'new', 'type': TaskType.NORMAL}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get('/v1/tasks').data['count'], 2)
+        self.assertEqual(self.client.get(f'/v1/tasks/{self.task.external_id}').status_code, 200)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(email="other@example.com", name="other", password="!"))
+        self.assertEqual(other.get('/v1/tasks').data['count'], 0)
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post('/v1/tasks', {'type': 'unknown'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/v1/tasks').data['count'], 0)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_cache_misses_read_from_primary(self):
+        response = self.client.get('/v1/tasks')
+        self.assertEqual((response['X-Cache'], response.data['count']), ('MISS', 1))
+        self.assertIn('ETag', response)
+        response = self.client.get('/v1/tasks')
+        self.assertEqual((response['X-Cache'], response.data['count']), ('HIT', 1))
+
+        response = self.client.get(f'/v1/tasks/{self.task.external_id}')
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+        self.assertEqual(self.client.get(f'/v1/tasks/{self.task.external_id}')['X-Cache'], 'HIT')
+
+    def test_counters_follow_the_database_written(self):
+        # The replica test database stands in for any other database here.
+        user = User.objects.db_manager(REPLICA_ALIAS).create_user(email="elsewhere@example.com", name="elsewhere", password="!")
+        primary_stats = list(UserTaskStats.objects.using(DEFAULT_DB_ALIAS).values())
+        Task(name="elsewhere", assigned_to=user, status=TaskStatus.PENDING).save(using=REPLICA_ALIAS)
+        self.assertEqual(UserTaskStats.objects.using(REPLICA_ALIAS).get(user=user).pending, 1)
+        self.assertEqual(list(UserTaskStats.objects.using(DEFAULT_DB_ALIAS).values()), primary_stats)
+
+    def test_writes_go_to_primary(self):
+        router = PrimaryReplicaRouter()
+        token = current_replica.set(REPLICA_ALIAS)
+        try:
+            self.assertEqual(router.db_for_read(Task), REPLICA_ALIAS)
+            self.assertEqual(router.db_for_write(Task), DEFAULT_DB_ALIAS)
+        finally:
+            current_replica.reset(token)
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as queries:
+            response = self.client.post('/v1/tasks/assign_task', {
+                'user_id': str(self.user.external_id),
+                'task_id': str(self.task.external_id),
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries.captured_queries, [])
+
+
+# Routing would send the list and retrieve queries to a replica.
+@override_settings(DATABASE_REPLICAS=[])
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Runs every TaskViewSet and UserViewSet action on enough rows to expose
+    per-row queries, within the query budget the viewset declares.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", name="admin", password="!")
+        cls.users = [
+            User.objects.create_user(email=f"budget{i}@example.com", name=f"budget {i}", password="!")
+            for i in range(5)
+        ]
+        now = timezone.now()
+        cls.tasks = Task.objects.bulk_create([
+            Task(
+                name=f"task {i}",
+                assigned_to=cls.users[i % 5] if i % 4 else None,
+                status=TaskStatus.PENDING if i % 4 else TaskStatus.UNASSIGNED,
+                type=TaskType.NORMAL,
+                deadline=now + timedelta(days=1),
+            )
+            for i in range(20)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.task = Task.objects.filter(assigned_to=self.users[1]).first()
+
+    def test_every_action_declares_a_budget(self):
+        self.assertQueryBudgetsDeclared(TaskViewSet)
+        self.assertQueryBudgetsDeclared(UserViewSet)
+
+    def test_task_reads(self):
+        with self.assertWithinQueryBudget(TaskViewSet, 'list'):
+            response = self.client.get('/v1/tasks?limit=20')
+        self.assertEqual(len(response.data['results']), 20)
+        with self.assertWithinQueryBudget(TaskViewSet, 'list'):
+            response = self.client.get('/v1/tasks?pagination=cursor&with_count=true&limit=20')
+        self.assertEqual(response.status_code, 200)
+        with self.assertWithinQueryBudget(TaskViewSet, 'retrieve'):
+            response = self.client.get(f'/v1/tasks/{self.task.external_id}')
+        self.assertEqual(response.status_code, 200)
+        with self.assertWithinQueryBudget(TaskViewSet, 'export'):
+            response = self.client.get('/v1/tasks/export')
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 20)
+
+    def test_task_writes(self):
+        with self.assertWithinQueryBudget(TaskViewSet, 'create'):
+            response = self.client.post('/v1/tasks', {'name': 'new', 'type': TaskType.URGENT}, format='json')
+        self.assertEqual(response.status_code, 201)
+        with self.assertWithinQueryBudget(TaskViewSet, 'bulk'):
+            response = self.client.post(
+                '/v1/tasks/bulk', [{'name': f'bulk {i}', 'type': TaskType.LOW} for i in range(20)], format='json',
+            )
+        self.assertEqual(len(response.data['tasks']), 20)
+        with self.assertWithinQueryBudget(TaskViewSet, 'partial_update'):
+            response = self.client.patch(f'/v1/tasks/{self.task.external_id}', {'name': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        unassigned = Task.objects.filter(assigned_to=None).first()
+        with self.assertWithinQueryBudget(TaskViewSet, 'assign_task'):
+            response = self.client.post('/v1/tasks/assign_task', {
+                'user_id': str(self.users[2].external_id),
+                'task_id': str(unassigned.external_id),
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        with self.assertWithinQueryBudget(TaskViewSet, 'complete_task'):
+            response = self.client.post(f'/v1/tasks/{self.task.external_id}/complete_task')
+        self.assertEqual(response.status_code, 200)
+        with self.assertWithinQueryBudget(TaskViewSet, 'bulk_transition'):
+            response = self.client.post('/v1/tasks/bulk_transition', {
+                'external_ids': [str(task.external_id) for task in self.tasks],
+                'status': TaskStatus.IN_PROGRESS,
+            }, format='json')
+        # The unassigned tasks, a fifth less the one assigned above, cannot start.
+        self.assertEqual((len(response.data['updated']), len(response.data['errors'])), (16, 4))
+        with self.assertWithinQueryBudget(TaskViewSet, 'destroy'):
+            response = self.client.delete(f'/v1/tasks/{self.task.external_id}')
+        self.assertEqual(response.status_code, 204)
+
+    def test_task_assignment(self):
+        with self.assertWithinQueryBudget(TaskViewSet, 'claim'):
+            response = self.client.post('/v1/tasks/claim', {'count': 3}, format='json')
+        self.assertEqual(len(response.data['tasks']), 3)
+        with self.assertWithinQueryBudget(TaskViewSet, 'auto_assign'):
+            response = self.client.post('/v1/tasks/auto_assign', {}, format='json')
+        self.assertEqual(response.data['assigned'], 2)
+
+    def test_user_actions(self):
+        with self.assertWithinQueryBudget(UserViewSet, 'list'):
+            response = self.client.get('/v1/users')
+        self.assertEqual(len(response.data['results']), 6)
+        with self.assertWithinQueryBudget(UserViewSet, 'retrieve'):
+            response = self.client.get(f'/v1/users/{self.users[0].external_id}')
+        self.assertEqual(response.status_code, 200)
+        with self.assertWithinQueryBudget(UserViewSet, 'partial_update'):
+            response = self.client.patch(f'/v1/users/{self.users[0].external_id}', {'name': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with self.assertWithinQueryBudget(UserViewSet, 'destroy'):
+            response = self.client.delete(f'/v1/users/{self.users[0].external_id}')
+        self.assertEqual(response.status_code, 204)
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/v1/users/{self.users[0].external_id}')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[0-9.]+;desc="1 queries", total;dur=[0-9.]+$')
+
+
+@override_settings(DATABASE_REPLICAS=[], METRICS_TOKEN="secret", METRICS_PUBLIC=False)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", name="admin", password="!")
+        Task.objects.create(name="pending", assigned_to=cls.admin, status=TaskStatus.PENDING)
+        Task.objects.create(name="unassigned", status=TaskStatus.UNASSIGNED)
+
+    def setUp(self):
+        cache.delete(STATUS_CACHE_KEY)
+        self.client = APIClient(HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_exposes_request_and_status_metrics(self):
+        self.client.get('/v1/tasks')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",view="task_assigner:tasks-list"}', body)
+        self.assertIn('tasks{status="pending"} 1.0', body)
+        self.assertIn('tasks{status="completed"} 0.0', body)
+
+    def test_status_gauges_are_cached(self):
+        self.client.get('/metrics')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/metrics')
+        self.assertEqual(len(queries), 0)
+
+    def test_token(self):
+        anonymous = APIClient()
+        anonymous.force_authenticate(self.admin)
+        self.assertEqual(anonymous.get('/metrics').status_code, 403)
+        self.assertEqual(anonymous.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+        with self.settings(METRICS_TOKEN=""):
+            self.assertEqual(anonymous.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+            with self.settings(METRICS_PUBLIC=True):
+                self.assertEqual(anonymous.get('/metrics').status_code, 200)
+
+
+class DeadlineSchedulerTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.scheduler = DeadlineScheduler(fakeredis.FakeRedis())
+        patcher = mock.patch('task_assigner.scheduler.get_deadline_scheduler', return_value=self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scheduled(self):
+        return {int(task_id): score for task_id, score in self.scheduler.client.zrange(
+            self.scheduler.key, 0, -1, withscores=True
+        )}
+
+
+@override_settings(DEADLINE_SCHEDULER_ENABLED=True)
+class DeadlineSchedulerTests(DeadlineSchedulerTestMixin, TestCase):
+    """
+    Checks that deadlines are registered as tasks change, popped once when
+    due, and that every popped task is either expired or registered again.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="deadline@example.com", name="deadline", password="!")
+
+    def create_task(self, deadline, status=TaskStatus.PENDING):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(name="task", assigned_to=self.user, status=status, deadline=deadline)
+
+    def test_saves_register_and_drop_deadlines(self):
+        deadline = timezone.now() + timedelta(hours=1)
+        task = self.create_task(deadline)
+        self.assertEqual(self.scheduled(), {task.pk: deadline.timestamp()})
+
+        task.deadline = deadline + timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.scheduled(), {task.pk: task.deadline.timestamp()})
+
+        task.status = TaskStatus.COMPLETED
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.scheduled(), {})
+
+    def test_pop_due_pops_each_due_task_once(self):
+        now = timezone.now()
+        self.scheduler.schedule({1: now - timedelta(minutes=1), 2: now, 3: now + timedelta(minutes=1)})
+
+        self.assertEqual(sorted(self.scheduler.pop_due(now, 10)), [1, 2])
+        self.assertEqual(self.scheduler.pop_due(now, 10), [])
+        self.assertAlmostEqual(self.scheduler.next_due_in(now), 60, places=3)
+
+    def test_expires_tasks_due_at_now(self):
+        now = timezone.now()
+        task = self.create_task(now)
+        due = self.scheduler.pop_due(now, 10)
+
+        self.assertEqual(expire_scheduled_tasks(self.scheduler, now, due, now + timedelta(seconds=1)), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, TaskStatus.FAILED)
+        self.assertEqual(self.user.task_stats.failed, 1)
+        self.assertEqual(self.scheduled(), {})
+
+    def test_registers_again_tasks_that_were_not_expired(self):
+        now = timezone.now()
+        moved = self.create_task(now - timedelta(minutes=1))
+        finished = self.create_task(now - timedelta(minutes=1))
+        due = self.scheduler.pop_due(now, 10)
+        # Changed after being popped, before the batch ran.
+        later = now + timedelta(hours=1)
+        Task.objects.filter(pk=moved.pk).update(deadline=later)
+        Task.objects.filter(pk=finished.pk).update(status=TaskStatus.COMPLETED)
+
+        self.assertEqual(expire_scheduled_tasks(self.scheduler, now, due, now + timedelta(seconds=1)), 0)
+        self.assertEqual(self.scheduled(), {moved.pk: later.timestamp()})
+
+    def test_sweep_keeps_strict_deadlines(self):
+        now = timezone.now()
+        self.create_task(now)
+        self.assertEqual(expire_task_batch(now, 10), 0)
+        self.assertEqual(expire_task_batch(now + timedelta(microseconds=1), 10), 1)
+
+
+@override_settings(DEADLINE_SCHEDULER_ENABLED=True)
+class DeadlineSchedulerLockTests(DeadlineSchedulerTestMixin, TransactionTestCase):
+    """
+    Checks that a due task whose row is locked by another transaction is
+    registered again for a retry instead of being dropped.
+    """
+
+    def test_locked_task_is_retried(self):
+        user = User.objects.create_user(email="locked@example.com", name="locked", password="!")
+        now = timezone.now()
+        task = Task.objects.create(name="task", assigned_to=user, status=TaskStatus.PENDING, deadline=now)
+        self.scheduler.schedule({task.pk: now})
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Task.objects.select_for_update().get(pk=task.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            locked.wait(10)
+            retry_at = now + timedelta(seconds=1)
+            due = self.scheduler.pop_due(now, 10)
+            self.assertEqual(expire_scheduled_tasks(self.scheduler, now, due, retry_at), 0)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(self.scheduled(), {task.pk: retry_at.timestamp()})
+        retried = self.scheduler.pop_due(retry_at, 10)
+        self.assertEqual(expire_scheduled_tasks(self.scheduler, retry_at, retried, retry_at), 1)
+
+
+class FakeRunIdBlacklistFilter(BlacklistFilter):
+    # fakeredis has no INFO, the run id of the server is kept in a key.
+    server_run_id = "redis.call('GET', 'test:run_id')"
+
+    def restart(self):
+        self.client.set('test:run_id', uuid4().hex)
+
+
+@override_settings(TOKEN_BLACKLIST_FILTER_ENABLED=True)
+class BlacklistFilterTests(TestCase):
+    """
+    Checks that the blacklist filter answers only once seeded on the running
+    Redis server, and that refreshes fall back to the blacklist table
+    whenever it cannot answer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="refresh@example.com", name="refresh", password="!")
+
+    def setUp(self):
+        self.filter = FakeRunIdBlacklistFilter(fakeredis.FakeRedis(), 2 ** 16, 7)
+        self.filter.restart()
+        patcher = mock.patch('task_assigner.blacklist.get_blacklist_filter', return_value=self.filter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.blacklisted = FilteredRefreshToken.for_user(self.user)
+        self.blacklisted.blacklist()
+        self.live = FilteredRefreshToken.for_user(self.user)
+
+    def might_contain(self, token):
+        return self.filter.might_contain(token['jti'], OutstandingToken.objects.get(jti=token['jti']).expires_at)
+
+    def test_seed_trusts_the_filter(self):
+        self.assertIsNone(self.might_contain(self.live))
+        self.assertTrue(self.filter.seed(100))
+        self.assertFalse(self.filter.seed(100))
+
+        self.assertTrue(self.might_contain(self.blacklisted))
+        self.assertFalse(self.might_contain(self.live))
+
+        self.live.blacklist()
+        self.assertTrue(self.might_contain(self.live))
+
+    def test_restart_distrusts_the_filter(self):
+        self.filter.seed(100)
+        # The ready key survives a restart from a snapshot, the run id does not.
+        self.filter.restart()
+        self.assertIsNone(self.might_contain(self.live))
+        self.assertTrue(self.filter.seed(100))
+        self.assertFalse(self.might_contain(self.live))
+
+    def test_distrust_during_seed_keeps_the_filter_distrusted(self):
+        add = self.filter.add
+
+        def add_then_distrust(tokens):
+            add(tokens)
+            self.filter.distrust()
+
+        with mock.patch.object(self.filter, 'add', side_effect=add_then_distrust):
+            self.assertFalse(self.filter.seed(100))
+        self.assertIsNone(self.might_contain(self.live))
+
+    def test_failed_add_distrusts_the_filter(self):
+        self.filter.seed(100)
+        with mock.patch.object(self.filter, 'add', side_effect=RedisError), self.assertLogs('task_assigner.blacklist'):
+            self.live.blacklist()
+        self.assertIsNone(self.might_contain(self.live))
+
+    def test_refresh_checks(self):
+        self.filter.seed(100)
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(str(self.live))
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(self.blacklisted))
+
+    def test_refresh_falls_back_to_the_database(self):
+        # Not seeded: the blacklist table answers.
+        with self.assertNumQueries(1), self.assertRaises(TokenError):
+            FilteredRefreshToken(str(self.blacklisted))
+
+        self.filter.seed(100)
+        with mock.patch.object(self.filter, 'might_contain', side_effect=RedisError), \
+                self.assertLogs('task_assigner.blacklist'):
+            with self.assertNumQueries(1), self.assertRaises(TokenError):
+                FilteredRefreshToken(str(self.blacklisted))
+            with self.assertNumQueries(1):
+                FilteredRefreshToken(str(self.live))
+
+
+class AuthUserCacheTests(TestCase):
+    """
+    Checks that access token users are served from the cache without their
+    password hash, and that a change to the user is never hidden by a copy
+    read before it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="cached@example.com", name="cached", password="secret")
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.auth = CachedJWTAuthentication()
+        self.token = self.auth.get_validated_token(str(AccessToken.for_user(self.user)))
+
+    def deactivate(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        forget_cached_user(self.user.pk)
+
+    def test_users_are_cached_without_password(self):
+        with self.assertNumQueries(1):
+            self.auth.get_user(self.token)
+        local_users.clear()
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token)
+
+        self.assertEqual((user.pk, user.email, user.is_active), (self.user.pk, self.user.email, True))
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertNotIn(self.user.password, str(cache.get(USER_CACHE_KEY.format(user_id=self.user.pk))))
+        # Deferred fields are still loaded on demand.
+        self.assertTrue(user.check_password("secret"))
+
+    def test_saving_the_user_forgets_it(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_copy_read_before_a_change_is_ignored(self):
+        def change_then_set(key, value, timeout):
+            # The user changes after this request read it from the database.
+            self.deactivate()
+            cache.set(key, value, timeout)
+
+        with mock.patch('utils.authentication.cache', wraps=cache) as patched:
+            patched.set.side_effect = change_then_set
+            self.auth.get_user(self.token)
+
+        # Another process, without the local copy.
+        local_users.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_password_change_revokes_cached_tokens(self):
+        # Modules keep the api_settings they imported, override_settings
+        # does not reach them.
+        patcher = mock.patch.object(jwt_settings.api_settings, 'CHECK_REVOKE_TOKEN', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        token = self.auth.get_validated_token(str(AccessToken.for_user(self.user)))
+        self.auth.get_user(token)
+
+        self.user.set_password("changed")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(token)
+
+
+@override_settings(DATABASE_REPLICAS=[], RESPONSE_CACHE_ENABLED=False)
+class AsyncAuthTests(TransactionTestCase):
+    """
+    Checks the async auth endpoints, whose handlers run in the password
+    hashing pool on their own connections, and that logins upgrade hashes
+    to the hasher of the current PASSWORD_HASHER_PROFILE.
+    """
+
+    def setUp(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        patcher = mock.patch('task_assigner.views.async_auth.password_executor', executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(lambda: executor.submit(connections.close_all).result())
+
+    def post(self, path, data):
+        return self.client.post(path, data, content_type='application/json')
+
+    def hashers(self, profile):
+        return get_password_hashers(profile, settings.PASSWORD_HASHER_PROFILES)
+
+    def test_register_and_login(self):
+        response = self.post('/v1/async/auth/register', {
+            'email': 'async@example.com', 'name': 'async', 'password': 'secret', 'password2': 'secret',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.json()['token']), {'access', 'refresh'})
+        self.assertTrue(User.objects.get(email='async@example.com').check_password('secret'))
+
+        response = self.post('/v1/async/auth/login', {'email': 'async@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json()['token'])
+        response = self.post('/v1/async/auth/login', {'email': 'async@example.com', 'password': 'wrong'})
+        self.assertEqual((response.status_code, response.json()), (401, {'error': 'Invalid credentials'}))
+
+    def test_invalid_requests(self):
+        response = self.client.post('/v1/async/auth/login', '{"email":', content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (400, {'detail': 'JSON parse error.'}))
+
+        response = self.post('/v1/async/auth/login', {'password': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        response = self.post('/v1/async/auth/register', {
+            'email': 'async@example.com', 'name': 'async', 'password': 'secret', 'password2': 'other',
+        })
+        self.assertEqual((response.status_code, response.json()), (400, {'password': ['Passwords must match.']}))
+        self.assertFalse(User.objects.exists())
+        self.assertEqual(self.client.get('/v1/async/auth/login').status_code, 405)
+
+    def test_login_rehashes_with_new_profile(self):
+        with override_settings(PASSWORD_HASHERS=self.hashers('pbkdf2')):
+            user = User.objects.create_user(email="rehash@example.com", name="rehash", password="secret")
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        with override_settings(PASSWORD_HASHERS=self.hashers('argon2')):
+            response = self.post('/v1/async/auth/login', {'email': 'rehash@example.com', 'password': 'secret'})
+            self.assertEqual(response.status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('argon2$argon2id$'))
+            self.assertIn('m=19456,t=2,p=1', user.password)
+            self.assertTrue(user.check_password('secret'))
+
+    def test_profile_selects_first_hasher(self):
+        for profile, hasher in settings.PASSWORD_HASHER_PROFILES.items():
+            with self.subTest(profile=profile):
+                hashers = self.hashers(profile)
+                self.assertEqual(hashers[0], hasher)
+                self.assertEqual(set(hashers[1:-1]), set(settings.PASSWORD_HASHER_PROFILES.values()) - {hasher})
+        self.assertEqual(settings.PASSWORD_HASHERS, self.hashers(settings.PASSWORD_HASHER_PROFILE))
+        with self.assertRaises(ImproperlyConfigured):
+            self.hashers('md5')
+
+
+class ConditionalRequestTests(TestCase):
+    """
+    Checks the 304 answers of task reads and the 412 answers of conditional
+    updates, and that list validators cost no query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", name="admin", password="!")
+        cls.task = Task.objects.create(name="task", assigned_to=cls.admin, status=TaskStatus.PENDING)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/v1/tasks/{self.task.external_id}'
+
+    def patch(self, data, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(self.url, data, format='json', **headers)
+
+    def test_retrieve_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        self.patch({'name': 'renamed'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_not_modified_without_queries(self):
+        etag = self.client.get('/v1/tasks?status=pending')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/v1/tasks?status=pending', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get('/v1/tasks?status=completed')['ETag'], etag)
+
+        self.patch({'name': 'renamed'})
+        response = self.client.get('/v1/tasks?status=pending', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['name'], 'renamed')
+
+    def test_update_precondition(self):
+        etag = self.client.get(self.url)['ETag']
+        self.patch({'name': 'concurrent'})
+
+        response = self.patch({'name': 'stale'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.name, 'concurrent')
+
+        response = self.patch({'name': 'fresh'}, HTTP_IF_MATCH=self.client.get(self.url)['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class BulkTransitionTests(TestCase):
+    """
+    Checks that bulk transitions report bad items one by one, keep the
+    counters and completion times consistent and skip deleted tasks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", name="admin", password="!")
+        cls.user = User.objects.create_user(email="bulk@example.com", name="bulk", password="!")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_task(self, **kwargs):
+        return Task.objects.create(name="task", **{'assigned_to': self.user, 'status': TaskStatus.PENDING, **kwargs})
+
+    def transition(self, tasks, target, extra_ids=()):
+        external_ids = [str(task.external_id) for task in tasks] + list(extra_ids)
+        return self.client.post(
+            '/v1/tasks/bulk_transition', {'external_ids': external_ids, 'status': target}, format='json'
+        )
+
+    def test_bad_items_are_reported_per_item(self):
+        task = self.create_task()
+        unassigned = self.create_task(assigned_to=None, status=TaskStatus.UNASSIGNED)
+        deleted = self.create_task(deleted=True)
+        missing = str(uuid4())
+
+        response = self.transition([task, unassigned, deleted], TaskStatus.IN_PROGRESS, ['not-a-uuid', missing])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [str(task.external_id)])
+        errors = {error['external_id']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(
+            set(errors), {'not-a-uuid', missing, str(unassigned.external_id), str(deleted.external_id)}
+        )
+        self.assertEqual(errors[str(deleted.external_id)], ['Task not found.'])
+
+        unassigned.refresh_from_db()
+        deleted.refresh_from_db()
+        self.assertEqual(unassigned.status, TaskStatus.UNASSIGNED)
+        self.assertEqual(deleted.status, TaskStatus.PENDING)
+
+    def test_assigned_tasks_cannot_become_unassigned(self):
+        task = self.create_task()
+        response = self.transition([task], TaskStatus.UNASSIGNED)
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual(len(response.data['errors']), 1)
+
+    def test_reopened_tasks_lose_their_completion_time(self):
+        tasks = [self.create_task(), self.create_task()]
+        self.transition(tasks, TaskStatus.COMPLETED)
+        for task in tasks:
+            task.refresh_from_db()
+            self.assertIsNotNone(task.completed_at)
+
+        self.transition(tasks, TaskStatus.PENDING)
+        for task in tasks:
+            task.refresh_from_db()
+            self.assertEqual(task.status, TaskStatus.PENDING)
+            self.assertIsNone(task.completed_at)
+
+        stats = UserTaskStats.objects.get(user=self.user)
+        self.assertEqual((stats.pending, stats.completed), (2, 0))
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class BulkCreateTests(TestCase):
+    """
+    Checks that bulk creation inserts the valid items, reports the invalid
+    ones by position and is reserved to admins like bulk transitions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", name="admin", password="!")
+        cls.user = User.objects.create_user(email="bulk@example.com", name="bulk", password="!")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_invalid_items_are_reported_by_index(self):
+        response = self.client.post('/v1/tasks/bulk', [
+            {'name': 'first', 'type': TaskType.URGENT},
+            {'name': 'bad type', 'type': 'unknown'},
+            {'type': TaskType.LOW},
+            {'name': 'last', 'deadline': '2030-01-01T00:00:00Z'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([task['name'] for task in response.data['tasks']], ['first', 'last'])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('type', response.data['errors'][0]['errors'])
+        self.assertIn('name', response.data['errors'][1]['errors'])
+        self.assertEqual(set(Task.objects.values_list('name', flat=True)), {'first', 'last'})
+
+        response = self.client.post('/v1/tasks/bulk', [{'type': 'unknown'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['tasks'], [])
+
+    def test_empty_payload_is_rejected(self):
+        response = self.client.post('/v1/tasks/bulk', [], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'non_field_errors': ['Expected at least one task.']})
+
+    def test_bulk_actions_require_admin(self):
+        task = Task.objects.create(name="task", assigned_to=self.user, status=TaskStatus.PENDING)
+        requests = (
+            ('/v1/tasks/bulk', [{'name': 'task', 'type': TaskType.LOW}]),
+            ('/v1/tasks/bulk_transition', {'external_ids': [str(task.external_id)], 'status': TaskStatus.FAILED}),
+        )
+        member = APIClient()
+        member.force_authenticate(self.user)
+        for path, payload in requests:
+            self.assertEqual(APIClient().post(path, payload, format='json').status_code, 401)
+            self.assertEqual(member.post(path, payload, format='json').status_code, 403)
+        self.assertEqual(Task.objects.get().status, TaskStatus.PENDING)
@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from task_assigner.views.auth import login_user, register_user
+
+# Password hashing is CPU bound and releases the GIL, so a pool sized to the
+# cores verifies that many logins in parallel while the event loop keeps
+# serving other requests. Logins beyond that wait in the pool's queue instead
+# of occupying a worker each.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix='password-hash',
+)
+
+
+def call_with_connection(func, *args):
+    # Pool threads live outside the request cycle, which normally recycles
+    # database connections.
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_auth_handler(request, handler):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"detail": "JSON parse error."}, status=status.HTTP_400_BAD_REQUEST)
+
+    loop = asyncio.get_running_loop()
+    # Run in the request's context, which carries the query instrumentation.
+    context = contextvars.copy_context()
+    try:
+        body, status_code = await loop.run_in_executor(
+            password_executor, context.run, call_with_connection, handler, data,
+        )
+    except ValidationError as exc:
+        body, status_code = exc.detail, status.HTTP_400_BAD_REQUEST
+    return JsonResponse(body, status=status_code, safe=False)
+
+
+@csrf_exempt
+@require_POST
+async def async_register(request):
+    """
+    Async variant of APIRegistrationView, for ASGI deployments.
+    """
+    return await run_auth_handler(request, register_user)
+
+
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    """
+    Async variant of APILoginView, for ASGI deployments.
+    """
+    return await run_auth_handler(request, login_user)
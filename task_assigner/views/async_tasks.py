@@ -0,0 +1,75 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+
+from task_assigner.models import ArchivedTask, Task
+from task_assigner.serializers.tasks import ArchivedTaskSerializer, TaskSerializer
+from task_assigner.views.tasks import TaskFilter, TaskViewSet, get_task_queryset
+from utils.pagination import CustomLimitOffsetPagination, KeysetPagination, uses_cursor_pagination
+
+# These views serve the read endpoints of TaskViewSet from coroutines. Rows
+# are read with the async ORM, so under ASGI a slow query parks a coroutine
+# instead of holding a worker. Like TaskViewSet they allow anonymous access.
+# Serialization runs inline: querysets select everything TaskSerializer
+# reads, so it performs no query.
+
+
+def filter_tasks(request):
+    """
+    Returns the tasks matching the TaskFilter query parameters, or the
+    errors response when they are invalid.
+    """
+    filterset = TaskFilter(request.GET, queryset=get_task_queryset(Task.objects.all(), request.GET), request=request)
+    if not filterset.is_valid():
+        return None, JsonResponse(ValidationError(filterset.errors).detail, status=status.HTTP_400_BAD_REQUEST)
+    return filterset.qs, None
+
+
+@require_GET
+async def async_task_list(request):
+    """
+    Async variant of TaskViewSet.list, with the same filters and pagination.
+    """
+    queryset, error = filter_tasks(request)
+    if error is not None:
+        return error
+
+    drf_request = Request(request)
+    paginator = KeysetPagination() if uses_cursor_pagination(request.GET) else CustomLimitOffsetPagination()
+    try:
+        page = await paginator.apaginate_queryset(queryset, drf_request, view=TaskViewSet)
+    except NotFound as exc:
+        # Raised for invalid cursors.
+        return JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    data = TaskSerializer(page, many=True, context={'request': drf_request}).data
+    return JsonResponse(paginator.get_paginated_data(data))
+
+
+@require_GET
+async def async_task_detail(request, external_id):
+    """
+    Async variant of TaskViewSet.retrieve, including the archive fallback.
+    """
+    queryset, error = filter_tasks(request)
+    if error is not None:
+        return error
+
+    context = {'request': Request(request)}
+    try:
+        task = await queryset.aget(external_id=external_id)
+        return JsonResponse(TaskSerializer(task, context=context).data)
+    except Task.DoesNotExist:
+        pass
+
+    try:
+        task = await ArchivedTask.objects.select_related('assigned_to__task_stats').aget(
+            external_id=external_id, deleted=False
+        )
+    except ArchivedTask.DoesNotExist:
+        return JsonResponse(
+            {"detail": "No ArchivedTask matches the given query."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    return JsonResponse(ArchivedTaskSerializer(task, context=context).data)
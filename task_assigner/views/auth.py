@@ -16,7 +16,34 @@ def get_tokens_for_user(user):
         'refresh': str(refresh),
         'access': str(refresh.access_token),
     }
-# test
+
+
+def register_user(data):
+    """
+    Creates a user and returns the response body and status. Shared by the
+    sync and async views, it runs blocking password hashing.
+    """
+    serializer = RegistrationSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    user = serializer.save()
+    return {"token": get_tokens_for_user(user)}, status.HTTP_201_CREATED
+
+
+def login_user(data):
+    """
+    Checks the credentials and returns the response body and status. Shared
+    by the sync and async views, it runs blocking password verification.
+    """
+    serializer = LoginSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    user = authenticate(
+        email=serializer.validated_data["email"],
+        password=serializer.validated_data["password"],
+    )
+    if user is None:
+        return {"error": "Invalid credentials"}, status.HTTP_401_UNAUTHORIZED
+    return {"token": get_tokens_for_user(user)}, status.HTTP_200_OK
+
 
 class APIRegistrationView(CreateAPIView):
     serializer_class = RegistrationSerializer
@@ -28,11 +55,8 @@ class APIRegistrationView(CreateAPIView):
         description="Register a new user",
     )
     def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.save()
-        token = get_tokens_for_user(user)
-        return Response({"token": token}, status=status.HTTP_201_CREATED)
+        body, status_code = register_user(request.data)
+        return Response(body, status=status_code)
 
 
 class APILoginView(CreateAPIView):
@@ -45,16 +69,5 @@ class APILoginView(CreateAPIView):
         description="Login",
     )
     def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = authenticate(
-            email=serializer.validated_data["email"],
-            password=serializer.validated_data["password"],
-        )
-        if user is not None:
-            token = get_tokens_for_user(user)
-            return Response({"token": token}, status=status.HTTP_200_OK)
-        else:
-            return Response(
-                {"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED
-            )
+        body, status_code = login_user(request.data)
+        return Response(body, status=status_code)
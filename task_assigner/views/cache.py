@@ -0,0 +1,21 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from utils.cache import get_cache_stats
+from task_assigner.views.tasks import TaskViewSet
+from task_assigner.views.users import UserViewSet
+
+
+class ResponseCacheStatsView(APIView):
+    """
+    Hit and miss counters of the list/retrieve response caches, for tuning
+    RESPONSE_CACHE_TIMEOUT.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    viewsets = (TaskViewSet, UserViewSet)
+
+    @extend_schema(tags=['cache'], description="Response cache hit and miss counters.")
+    def get(self, request, *args, **kwargs):
+        return Response(get_cache_stats(viewset.response_cache_name for viewset in self.viewsets))
@@ -2,31 +2,74 @@ from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveMode
 from rest_framework import permissions, status
 from drf_spectacular.utils import extend_schema
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.utils import timezone
 from django_filters.rest_framework import(
     OrderingFilter,
     CharFilter,
-    FilterSet
+    ChoiceFilter,
+    FilterSet,
+    IsoDateTimeFilter,
+    UUIDFilter
 )
 
 from task_assigner.permissions import IsAssignedToTask
 
-from utils.views.mixins import PartialUpdateModelMixin
+from utils.views.mixins import (
+    ConditionalRequestMixin,
+    CursorPaginationMixin,
+    PartialUpdateModelMixin,
+    ResponseCacheMixin,
+)
 from utils.views.base import BaseModelViewSetPlain
+from utils.export import streaming_export
+
+from task_assigner.models import ArchivedTask, Task, User, UserTaskStats
+from task_assigner.models.tasks import SEARCH_MODES
+from task_assigner.assignment import assign_unassigned_tasks, claim_tasks
+from task_assigner.serializers.tasks import (
+    TaskSerializer,
+    ArchivedTaskSerializer,
+    AssignTaskSerializer,
+    AutoAssignTaskSerializer,
+    BulkTransitionSerializer,
+    ClaimTaskSerializer,
+    TaskExportSerializer,
+)
+from task_assigner.tasks import auto_assign_tasks
+from task_assigner.models.enums import TaskStatus, TaskType
 
-from task_assigner.models import Task
-from task_assigner.serializers.tasks import TaskSerializer, AssignTaskSerializer
-from task_assigner.models.enums import TaskStatus
+
+EXPORT_FIELDS = (
+    'external_id',
+    'name',
+    'description',
+    'type',
+    'status',
+    'assigned_to__external_id',
+    'deadline',
+    'completed_at',
+    'created_at',
+    'updated_at',
+)
 
 
 class TaskFilter(FilterSet):
     """
     FilterSet for filtering tasks based on various fields.
     """
-    status = CharFilter(field_name='status', lookup_expr='iexact')
-    assigned_to = CharFilter(field_name='assigned_to__external_id', lookup_expr='iexact')
-    type = CharFilter(field_name='type', lookup_expr='iexact')
+    status = ChoiceFilter(field_name='status', choices=TaskStatus.choices)
+    assigned_to = UUIDFilter(field_name='assigned_to__external_id')
+    type = ChoiceFilter(field_name='type', choices=TaskType.choices)
+    # Bounds on the partition key, so only the matching months are scanned.
+    created_after = IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+    q = CharFilter(method='filter_search', label='Search')
+    search_mode = ChoiceFilter(choices=[(mode, mode) for mode in SEARCH_MODES], method='filter_search_mode')
 
     order_by = OrderingFilter(
         fields=(
@@ -39,7 +82,30 @@ class TaskFilter(FilterSet):
         }
     )
 
+    def filter_search(self, queryset, name, value):
+        mode = self.form.cleaned_data.get('search_mode') or 'websearch'
+        return queryset.search(value, mode)
+
+    def filter_search_mode(self, queryset, name, value):
+        # Only read by filter_search.
+        return queryset
+
+def get_task_queryset(queryset, query_params):
+    """
+    Live tasks as served by the API, with what TaskSerializer reads joined in.
+    Shared by TaskViewSet and the async task views.
+    """
+    queryset = queryset.filter(deleted=False).select_related('assigned_to__task_stats').defer('search_vector')
+    external_id = query_params.get('external_id', None)
+    if external_id:
+        queryset = queryset.filter(external_id=external_id)
+    return queryset
+
+
 class TaskViewSet(
+    ResponseCacheMixin,
+    ConditionalRequestMixin,
+    CursorPaginationMixin,
     BaseModelViewSetPlain,
     CreateModelMixin,
     ListModelMixin,
@@ -52,6 +118,28 @@ class TaskViewSet(
     """
     queryset = Task.objects.all()
     lookup_field = 'external_id'
+    cursor_ordering_fields = ('created_at', 'deadline')
+    validator_fields = ('updated_at', 'assigned_to__updated_at', 'assigned_to__task_stats__updated_at')
+    validator_models = (Task, User, UserTaskStats, ArchivedTask)
+    conditional_update_actions = ('partial_update', 'complete_task')
+    response_cache_name = 'tasks'
+    response_cache_models = validator_models
+    # Most SQL queries one request may run, savepoints of the test
+    # transaction included. Enforced by QueryBudgetTests, logged in production.
+    query_budgets = {
+        'list': 2,
+        'retrieve': 1,
+        'create': 4,  # includes the external_id check
+        'partial_update': 6,
+        'destroy': 5,
+        'assign_task': 9,  # the task row is locked in its own atomic block
+        'claim': 9,
+        'bulk': 2,  # includes the external_id check
+        'bulk_transition': 7,
+        'export': 1,
+        'complete_task': 8,
+        'auto_assign': 6,
+    }
     filterset_class = TaskFilter
     permission_classes = (permissions.AllowAny,)
     # permission_action_classes = {
@@ -67,17 +155,30 @@ class TaskViewSet(
     serializer_class = TaskSerializer
     serializer_action_classes = {
         'assign_task': AssignTaskSerializer,
+        'auto_assign': AutoAssignTaskSerializer,
+        'claim': ClaimTaskSerializer,
+        'bulk_transition': BulkTransitionSerializer,
     }
 
     def get_queryset(self):
         """
         Optionally restricts the returned tasks to a given user.
         """
-        queryset = self.queryset
-        external_id = self.request.query_params.get('external_id', None)
-        if external_id:
-            queryset = queryset.filter(external_id=external_id)
-        return queryset
+        return get_task_queryset(self.queryset, self.request.query_params)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Falls back to the archive for tasks moved out by `archive_tasks`.
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            task = get_object_or_404(
+                ArchivedTask.objects.select_related('assigned_to__task_stats'),
+                external_id=kwargs[self.lookup_field],
+                deleted=False,
+            )
+            return Response(ArchivedTaskSerializer(task, context=self.get_serializer_context()).data)
 
 
     @extend_schema(tags=['tasks'], description="Assign a task to a user.")
@@ -98,8 +199,81 @@ class TaskViewSet(
             status=status.HTTP_200_OK
         )
 
+    @extend_schema(tags=['tasks'], description="Claim the next unassigned tasks by priority.")
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def claim(self, request, *args, **kwargs):
+        """
+        Assign the next unassigned tasks to the requesting user.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task_ids = claim_tasks(request.user, serializer.validated_data['count'])
+        tasks = self.get_queryset().filter(pk__in=task_ids).by_priority()
+
+        return Response(
+            {
+                "message": f"Claimed {len(task_ids)} tasks.",
+                "tasks": TaskSerializer(tasks, many=True, context=self.get_serializer_context()).data
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @extend_schema(tags=['tasks'], description="Create many tasks at once.", request=TaskSerializer(many=True))
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create the valid tasks of a list payload and report the invalid ones.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        validated, errors = serializer.validate_items()
+        tasks = serializer.create(validated) if validated else []
+
+        return Response(
+            {
+                "message": f"Created {len(tasks)} tasks.",
+                "tasks": TaskSerializer(tasks, many=True, context=self.get_serializer_context()).data,
+                "errors": errors,
+            },
+            status=status.HTTP_201_CREATED if tasks else status.HTTP_400_BAD_REQUEST
+        )
+
+    @extend_schema(tags=['tasks'], description="Move many tasks to the same status.")
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_transition(self, request, *args, **kwargs):
+        """
+        Set the status of every listed task with a single UPDATE.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+
+        return Response(
+            {
+                "message": f"Updated {len(result['updated'])} tasks.",
+                **result,
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @extend_schema(tags=['tasks'], description="Stream the filtered tasks as NDJSON or CSV.", parameters=[TaskExportSerializer])
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every task matching the filters, read through a server-side cursor.
+        """
+        serializer = TaskExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None)
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('id')
+        rows = queryset.values(*EXPORT_FIELDS).iterator(chunk_size=settings.TASK_EXPORT_CHUNK_SIZE)
+
+        return streaming_export(request, rows, EXPORT_FIELDS, serializer.validated_data['export_format'], 'tasks')
+
     @extend_schema(tags=['tasks'], description="Complete a task.", request=None)
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def complete_task(self, request, *args, **kwargs):
         """
         Mark a task as completed.
@@ -115,4 +289,27 @@ class TaskViewSet(
                 "task": TaskSerializer(task, context=self.get_serializer_context()).data
             },
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+    @extend_schema(tags=['tasks'], description="Assign unassigned tasks to the least-loaded users.")
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def auto_assign(self, request, *args, **kwargs):
+        """
+        Run the assignment engine, inline or as a Celery job.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        limit = serializer.validated_data.get('limit')
+
+        if serializer.validated_data['run_async']:
+            auto_assign_tasks.delay(limit=limit)
+            return Response({"message": "Task assignment scheduled."}, status=status.HTTP_202_ACCEPTED)
+
+        assigned = assign_unassigned_tasks(limit=limit)
+        return Response(
+            {
+                "message": f"Assigned {assigned} tasks.",
+                "assigned": assigned,
+            },
+            status=status.HTTP_200_OK
+        )
@@ -1,15 +1,23 @@
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin, DestroyModelMixin
 from rest_framework import permissions
 
-from utils.views.mixins import PartialUpdateModelMixin
+from utils.views.mixins import (
+    ConditionalRequestMixin,
+    CursorPaginationMixin,
+    PartialUpdateModelMixin,
+    ResponseCacheMixin,
+)
 from utils.views.base import BaseModelViewSetPlain
 
-from task_assigner.models import User
+from task_assigner.models import User, UserTaskStats
 from task_assigner.serializers.users import UserSerializer
 
 
 
 class UserViewSet(
+    ResponseCacheMixin,
+    ConditionalRequestMixin,
+    CursorPaginationMixin,
     BaseModelViewSetPlain,
     ListModelMixin,
     RetrieveModelMixin,
@@ -21,6 +29,19 @@ class UserViewSet(
     """
     queryset = User.objects.all()
     lookup_field = 'external_id'
+    cursor_ordering_fields = ('created_at',)
+    validator_fields = ('updated_at', 'task_stats__updated_at')
+    validator_models = (User, UserTaskStats)
+    response_cache_name = 'users'
+    response_cache_models = validator_models
+    # Most SQL queries one request may run, savepoints of the test
+    # transaction included. Enforced by QueryBudgetTests, logged in production.
+    query_budgets = {
+        'list': 2,
+        'retrieve': 1,
+        'partial_update': 4,
+        'destroy': 9,
+    }
     permission_classes = (permissions.AllowAny,)
     # permission_action_classes = {
     #     'list': (permissions.AllowAny(),),
@@ -35,7 +56,7 @@ class UserViewSet(
         """
         Optionally restricts the returned users to a given user.
         """
-        queryset = self.queryset
+        queryset = self.queryset.select_related('task_stats')
         external_id = self.request.query_params.get('external_id', None)
         if external_id is not None:
             queryset = queryset.filter(external_id=external_id)
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from utils.cache import LocalLRUCache, incr
+from utils.metrics import record_cache_lookup
+
+USER_CACHE_KEY = 'auth:user:{user_id}'
+# Bumped whenever the user changes. Entries carry the version they were read
+# at, so one written back by a request that read the user before the change
+# is ignored.
+USER_VERSION_KEY = 'auth:user:{user_id}:version'
+
+# Fields of the cached users, the ones authentication and permission checks
+# read. The others, the password hash included, are deferred and loaded from
+# the database if a view needs them.
+AUTH_USER_FIELDS = (
+    'id', 'external_id', 'email', 'name', 'is_active', 'is_staff', 'is_superuser', 'is_admin', 'deleted',
+)
+
+local_users = LocalLRUCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_LOCAL_TTL)
+
+
+def forget_cached_user(user_id):
+    """
+    Drops a user from both cache levels and retires copies still being
+    written. Other processes keep their local copy for at most
+    AUTH_USER_CACHE_LOCAL_TTL seconds.
+    """
+    key = USER_CACHE_KEY.format(user_id=user_id)
+    local_users.delete(key)
+    incr(USER_VERSION_KEY.format(user_id=user_id))
+    cache.delete(key)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving the token's user through an in-process LRU
+    and then the shared cache before falling back to the database. Token
+    validation, including the blacklist checks, is left untouched.
+
+    Cache entries are `(version, values, password_md5)` tuples: the
+    `AUTH_USER_FIELDS` values and, when CHECK_REVOKE_TOKEN is on, the digest
+    the revocation claim is compared with.
+    """
+
+    def get_cached_fields(self):
+        # In model order, as from_db() expects partial rows.
+        return [field.attname for field in self.user_model._meta.concrete_fields if field.attname in AUTH_USER_FIELDS]
+
+    def load_entry(self, user_id):
+        key = USER_CACHE_KEY.format(user_id=user_id)
+        entry = local_users.get(key)
+        record_cache_lookup('auth_user_local', hit=entry is not None)
+        if entry is None:
+            version_key = USER_VERSION_KEY.format(user_id=user_id)
+            # The version is read before the database, so a change committed
+            # in between leaves the entry written below out of date.
+            cached = cache.get_many([key, version_key])
+            version = cached.get(version_key, 0)
+            entry = cached.get(key)
+            if entry is not None and entry[0] != version:
+                entry = None
+            record_cache_lookup('auth_user', hit=entry is not None)
+            if entry is None:
+                row = (
+                    self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                    .values_list(*self.get_cached_fields(), 'password')
+                    .first()
+                )
+                if row is None:
+                    raise AuthenticationFailed(_("User not found"), code="user_not_found")
+                password_md5 = get_md5_hash_password(row[-1]) if api_settings.CHECK_REVOKE_TOKEN else None
+                entry = (version, row[:-1], password_md5)
+                cache.set(key, entry, settings.AUTH_USER_CACHE_TTL)
+            local_users.set(key, entry)
+        return entry
+
+    def load_user(self, user_id):
+        """
+        Returns the user and the digest of its password, which is None
+        unless CHECK_REVOKE_TOKEN is on. Every call builds a new instance,
+        so requests may modify their user.
+        """
+        _, values, password_md5 = self.load_entry(user_id)
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, self.get_cached_fields(), values), password_md5
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user, password_md5 = self.load_user(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_md5:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
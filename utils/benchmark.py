@@ -0,0 +1,139 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+async def read_response(reader):
+    """
+    Reads one HTTP/1.1 response and returns its status, headers and body.
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    status = int(status_line.split(' ', 2)[1])
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    if status in (204, 304):
+        body = b''
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            chunks.append(await reader.readexactly(size + 2))
+            if size == 0:
+                break
+        body = b''.join(chunk[:-2] for chunk in chunks)
+    else:
+        body = await reader.read()
+    return status, headers, body
+
+
+class Client:
+    """
+    Minimal keep-alive HTTP/1.1 client, one connection per virtual user. Kept
+    dependency free and cheap per request, so the load generator is not the
+    bottleneck when measuring the server at high concurrency.
+    """
+
+    def __init__(self, base_url, headers=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.headers = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=b'', content_type='application/json'):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (
+            f'{method} {self.prefix}{path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            f'{self.headers}'
+        )
+        if body:
+            head += f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+        self.writer.write(head.encode('latin-1') + b'\r\n' + body)
+        try:
+            status, headers, body = await read_response(self.reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, headers, body
+
+
+async def drive(base_url, requests, concurrency, seconds, headers=None, on_response=None):
+    """
+    Sends requests from `concurrency` virtual users for `seconds` and returns
+    the summary of the run. `requests` yields `(method, path, body)` tuples
+    and is shared by all users; the run ends early once it is exhausted.
+    `on_response(status, headers, body)` may inspect each response, e.g. to
+    collect a header.
+    """
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+
+    async def user():
+        nonlocal errors
+        client = Client(base_url, headers)
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    method, path, body = next(requests)
+                except StopIteration:
+                    break
+                started = time.perf_counter()
+                try:
+                    status, response_headers, response_body = await client.request(method, path, body)
+                except (OSError, asyncio.IncompleteReadError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+                if on_response is not None:
+                    on_response(status, response_headers, response_body)
+        finally:
+            await client.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.monotonic() - started)
+
+
+def run(base_url, requests, concurrency, seconds, headers=None, on_response=None):
+    return asyncio.run(drive(base_url, requests, concurrency, seconds, headers, on_response))
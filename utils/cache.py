@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from utils.metrics import record_cache_lookup
+
+
+GENERATION_KEY = 'generation:{label}'
+STATS_KEY = 'response_cache:{name}:{outcome}'
+
+
+def incr(key, delta=1):
+    """
+    Atomically increments a counter that never expires, creating it first if
+    needed.
+    """
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def get_generations(labels):
+    """
+    Returns the current generation of each model label, in order.
+    """
+    keys = [GENERATION_KEY.format(label=label) for label in labels]
+    values = cache.get_many(keys)
+    return [values.get(key, 0) for key in keys]
+
+
+def bump_generation(*models):
+    for model in models:
+        incr(GENERATION_KEY.format(label=model._meta.label))
+
+
+def invalidate_cached_responses(*models, using=None):
+    """
+    Bumps the generation of `models` once the current transaction commits,
+    so every cached response depending on them is ignored from then on.
+    Bumping after the commit guarantees that a request reading the new
+    generation also reads the new rows.
+    """
+    transaction.on_commit(partial(bump_generation, *models), using=using)
+
+
+def build_cache_key(*parts):
+    return 'response:' + hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def record_cache_outcome(name, hit):
+    record_cache_lookup(name, hit)
+    incr(STATS_KEY.format(name=name, outcome='hits' if hit else 'misses'))
+
+
+def get_cache_stats(names):
+    """
+    Returns the hit and miss counters of the given response caches.
+    """
+    keys = {
+        name: (STATS_KEY.format(name=name, outcome='hits'), STATS_KEY.format(name=name, outcome='misses'))
+        for name in names
+    }
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    stats = {}
+    for name, (hits_key, misses_key) in keys.items():
+        hits, misses = values.get(hits_key, 0), values.get(misses_key, 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe in-process LRU cache whose entries expire after `ttl`
+    seconds. Used in front of the shared cache for values read on every
+    request, where even a Redis round trip is noticeable.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
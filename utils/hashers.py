@@ -0,0 +1,30 @@
+from django.contrib.auth.hashers import Argon2PasswordHasher
+from django.core.exceptions import ImproperlyConfigured
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with the OWASP minimum parameters (19 MiB, 2 passes, 1 lane).
+    Django's defaults use 100 MiB and 8 lanes per hash, which caps how many
+    logins a worker can verify concurrently. Hashes keep the `argon2`
+    algorithm name, so ones made with other parameters still verify and are
+    rehashed on the next login.
+    """
+    time_cost = 2
+    memory_cost = 19456
+    parallelism = 1
+
+
+def get_password_hashers(profile, profiles):
+    """
+    Returns the PASSWORD_HASHERS of `profile`, a key of `profiles`: its
+    hasher comes first and hashes new passwords, the others only verify
+    hashes made under another profile.
+    """
+    if profile not in profiles:
+        raise ImproperlyConfigured(f"PASSWORD_HASHER_PROFILE must be one of {', '.join(profiles)}, not {profile!r}.")
+    return [
+        profiles[profile],
+        *(hasher for name, hasher in profiles.items() if name != profile),
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    ]
@@ -1,6 +1,7 @@
 import random
 import string
 from django.db.models import Case, When, Value, IntegerField, F, ExpressionWrapper
+from django.db.models.lookups import Exact
 
 
 def get_random_string(length: int) -> str:
@@ -10,7 +11,7 @@ def get_random_string(length: int) -> str:
 
 def null_if_zero(expression):
     return Case(
-        When(expression=0, then=Value(1)),  # avoid zero by setting dummy denominator
+        When(Exact(expression, 0), then=Value(1)),  # avoid zero by setting dummy denominator
         default=expression,
         output_field=IntegerField()
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,159 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from utils.metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+# QueryStats recording the queries of the current context, innermost last.
+# Context variables follow the request into sync_to_async threads, so the
+# queries of async views are recorded too.
+active_query_stats = ContextVar('active_query_stats', default=())
+
+
+class QueryStats:
+    """
+    Number and total duration of the SQL queries run while collecting, with
+    the first `max_statements` statements kept for reporting.
+    """
+
+    def __init__(self, max_statements=0):
+        self.count = 0
+        self.duration = 0.0
+        self.max_statements = max_statements
+        self.statements = []
+
+    def record(self, alias, sql, duration):
+        self.count += 1
+        self.duration += duration
+        if len(self.statements) < self.max_statements:
+            self.statements.append({'database': alias, 'ms': round(duration * 1000, 2), 'sql': sql})
+
+
+def record_query(execute, sql, params, many, context):
+    collectors = active_query_stats.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for stats in collectors:
+            stats.record(context['connection'].alias, sql, duration)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@contextmanager
+def collect_queries(max_statements=0):
+    """
+    Records the queries run inside the block, on every database, into the
+    yielded QueryStats. Blocks can be nested.
+    """
+    # Connections opened before this module was imported missed the signal.
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+    stats = QueryStats(max_statements)
+    token = active_query_stats.set((*active_query_stats.get(), stats))
+    try:
+        yield stats
+    finally:
+        active_query_stats.reset(token)
+
+
+def get_view_action(request):
+    """
+    Returns the viewset and action that served `request`, or `(None, None)`
+    for other views.
+    """
+    view = getattr(request.resolver_match, 'func', None)
+    actions = getattr(view, 'actions', None)
+    if not actions:
+        return None, None
+    return view.cls, actions.get(request.method.lower())
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts the SQL queries and database time of each request. Both are sent
+    in a `Server-Timing` header, next to the total time, and logged as one
+    JSON line per request, with the query budget of the action when it
+    declares one (logged as a warning when exceeded). Requests slower than
+    `SLOW_REQUEST_THRESHOLD_MS` also log their first
+    `SLOW_REQUEST_MAX_STATEMENTS` statements. The same figures feed the
+    Prometheus histograms of utils.metrics.
+
+    Queries run while a streaming response is consumed happen after the
+    response left the middleware and are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with collect_queries(settings.SLOW_REQUEST_MAX_STATEMENTS) as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect_queries(settings.SLOW_REQUEST_MAX_STATEMENTS) as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - started)
+
+    def report(self, request, response, stats, elapsed):
+        elapsed_ms = elapsed * 1000
+        db_ms = stats.duration * 1000
+        if settings.SERVER_TIMING_ENABLED:
+            timing = f'db;dur={db_ms:.1f};desc="{stats.count} queries", total;dur={elapsed_ms:.1f}'
+            if response.has_header('Server-Timing'):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response['Server-Timing'] = timing
+
+        viewset, action = get_view_action(request)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'action': action,
+            'status': response.status_code,
+            'ms': round(elapsed_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': stats.count,
+        }
+        record_request(request.method, record['view'], response.status_code, elapsed, stats)
+        budget = getattr(viewset, 'query_budgets', {}).get(action)
+        if budget is not None:
+            record['query_budget'] = budget
+        over_budget = budget is not None and stats.count > budget
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+
+        if elapsed_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            logger.warning(json.dumps({**record, 'slow': True, 'statements': stats.statements}))
+        return response
@@ -0,0 +1,161 @@
+import os
+from functools import cache as memoize
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Metrics are written by every web and worker process. With
+# PROMETHEUS_MULTIPROC_DIR set (before this module is imported) each process
+# writes them to its own files in that directory and a scrape sums them up,
+# so all gunicorn or uvicorn workers are reported, not only the one that
+# answered /metrics.
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time spent answering requests, by view and status.',
+    ['method', 'view', 'status'],
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds',
+    'Time requests spent running SQL queries, by view.',
+    ['view'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries run per request, by view.',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total',
+    'Cache lookups, by cache and outcome (hit or miss).',
+    ['cache', 'outcome'],
+)
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds',
+    'Run time of Celery tasks, by task and final state.',
+    ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+CELERY_TASK_RETRIES = Counter(
+    'celery_task_retries_total',
+    'Celery task retries, by task.',
+    ['task'],
+)
+
+STATUS_CACHE_KEY = 'metrics:status'
+
+
+def record_cache_lookup(name, hit):
+    CACHE_LOOKUPS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def record_request(method, view, status, elapsed, stats):
+    """
+    Observes one request. `view` is the URL name, never the path, so the
+    number of label values stays bounded.
+    """
+    view = view or 'unmatched'
+    REQUEST_DURATION.labels(method, view, status).observe(elapsed)
+    REQUEST_DB_DURATION.labels(view).observe(stats.duration)
+    REQUEST_QUERIES.labels(view).observe(stats.count)
+
+
+@memoize
+def get_broker_client():
+    return redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+
+class StatusCollector:
+    """
+    Gauges read at scrape time: tasks by status and the length of the Celery
+    queues. Values are kept in CACHES for METRICS_STATUS_TTL seconds, so
+    however many processes are scraped, the task table is counted at most
+    once per interval and requests never pay for it.
+    """
+
+    def get_status(self):
+        status = cache.get(STATUS_CACHE_KEY)
+        if status is None:
+            from task_assigner.models import Task
+
+            status = {
+                'tasks': dict(
+                    Task.objects.filter(deleted=False).values_list('status').annotate(total=Count('id')).order_by()
+                ),
+                'queues': self.get_queue_lengths(),
+            }
+            cache.set(STATUS_CACHE_KEY, status, settings.METRICS_STATUS_TTL)
+        return status
+
+    def get_queue_lengths(self):
+        try:
+            pipeline = get_broker_client().pipeline(transaction=False)
+            for queue in settings.METRICS_CELERY_QUEUES:
+                pipeline.llen(queue)
+            return dict(zip(settings.METRICS_CELERY_QUEUES, pipeline.execute()))
+        except redis.RedisError:
+            return {}
+
+    def collect(self):
+        from task_assigner.models.enums import TaskStatus
+
+        status = self.get_status()
+        tasks = GaugeMetricFamily('tasks', 'Live tasks by status.', labels=['status'])
+        for value in TaskStatus.values:
+            tasks.add_metric([value], status['tasks'].get(value, 0))
+        yield tasks
+
+        queues = GaugeMetricFamily('celery_queue_length', 'Messages waiting in Celery queues.', labels=['queue'])
+        for queue, length in status['queues'].items():
+            queues.add_metric([queue], length)
+        yield queues
+
+
+# Scraped separately from the process metrics: its values are shared
+# through CACHES, summing them over processes would be wrong.
+status_registry = CollectorRegistry()
+status_registry.register(StatusCollector())
+
+
+def generate_metrics():
+    """
+    Returns the exposition of the metrics of every process when running in
+    multiprocess mode, of this process otherwise, followed by the status
+    gauges.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(status_registry)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Scrapers must send METRICS_TOKEN as a bearer
+    token, so nothing is exposed while it is unset, unless METRICS_PUBLIC
+    says the server is private.
+    """
+    if not settings.METRICS_PUBLIC and not (
+        settings.METRICS_TOKEN
+        and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}')
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -1,14 +1,39 @@
-from rest_framework.pagination import LimitOffsetPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
 from rest_framework.response import Response
 
 
+def uses_cursor_pagination(query_params):
+    """
+    Clients opt in to keyset pagination with `?pagination=cursor` or by
+    sending a `cursor` from a previous page.
+    """
+    return 'cursor' in query_params or query_params.get('pagination') == 'cursor'
+
+
 class CustomLimitOffsetPagination(LimitOffsetPagination):
     default_limit = 10
     max_limit = 30
 
-    def get_paginated_response(self, data):
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        `paginate_queryset` for async views, reading through the async ORM.
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [instance async for instance in queryset[self.offset:self.offset + self.limit]]
 
-        response_data = {
+    def get_paginated_data(self, data):
+        return {
             "has_previous": self.offset > 0,
             "has_next": self.offset + self.limit < self.count,
             "count": self.count,
@@ -16,4 +41,165 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
             "results": data,
         }
 
-        return Response(response_data)
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on `(ordering field, id)`.
+
+    Pages are fetched with a `WHERE (field, id) > (value, id)` style
+    predicate instead of OFFSET, so deep pages cost the same as the first
+    one. NULLs are always sorted last. The view lists the fields clients
+    may order by in `cursor_ordering_fields`, the first one is the default.
+    """
+    default_limit = 10
+    max_limit = 30
+    max_count = 10000
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'order_by'
+    count_query_param = 'with_count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page_queryset(queryset, request, view)
+        count_queryset = self.get_count_queryset(queryset, request)
+        self.count = count_queryset.count() if count_queryset is not None else None
+        return self.set_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        `paginate_queryset` for async views, reading through the async ORM.
+        """
+        page = self.get_page_queryset(queryset, request, view)
+        count_queryset = self.get_count_queryset(queryset, request)
+        self.count = await count_queryset.acount() if count_queryset is not None else None
+        return self.set_page([instance async for instance in page])
+
+    def get_page_queryset(self, queryset, request, view):
+        """
+        Returns the unevaluated query of the page, one row longer than the
+        limit to tell whether another page follows.
+        """
+        self.limit = self.get_limit(request)
+        self.field, self.descending = self.get_ordering(request, view)
+        self.model_field = queryset.model._meta.get_field(self.field)
+
+        position, self.reverse = self.decode_cursor(request)
+        self.has_position = position is not None
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position, self.reverse))
+        return queryset.order_by(*self.get_ordering_expressions(self.reverse))[:self.limit + 1]
+
+    def set_page(self, results):
+        """
+        Trims the fetched rows to the page and computes its cursors.
+        """
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.has_position
+
+        self.next_cursor = self.previous_cursor = None
+        if results and self.has_next:
+            self.next_cursor = self.encode_cursor(results[-1], reverse=False)
+        if results and self.has_previous:
+            self.previous_cursor = self.encode_cursor(results[0], reverse=True)
+        return results
+
+    def get_paginated_data(self, data):
+        return {
+            "has_previous": self.has_previous,
+            "has_next": self.has_next,
+            "previous": self.previous_cursor,
+            "next": self.next_cursor,
+            "count": self.count,
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param],
+                strict=True,
+                cutoff=self.max_limit,
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_ordering(self, request, view):
+        fields = getattr(view, 'cursor_ordering_fields', ('created_at',))
+        ordering = request.query_params.get(self.ordering_query_param, '').split(',')[0].strip()
+        if ordering.lstrip('-') in fields:
+            return ordering.lstrip('-'), ordering.startswith('-')
+        return fields[0], False
+
+    def get_count_queryset(self, queryset, request):
+        """
+        The count is only computed on request and is capped at `max_count`.
+        """
+        if request.query_params.get(self.count_query_param, '').lower() not in ('1', 'true'):
+            return None
+        return queryset.order_by()[:self.max_count]
+
+    def get_ordering_expressions(self, reverse):
+        descending = self.descending != reverse
+        if descending:
+            field = F(self.field).desc(nulls_first=True) if reverse else F(self.field).desc(nulls_last=True)
+        else:
+            field = F(self.field).asc(nulls_first=True) if reverse else F(self.field).asc(nulls_last=True)
+        return field, '-id' if descending else 'id'
+
+    def get_position_filter(self, position, reverse):
+        """
+        Rows strictly after `position` in the requested order, or strictly
+        before it when walking backwards.
+        """
+        value, pk = position
+        greater = self.descending == reverse
+        compare = 'gt' if greater else 'lt'
+        id_filter = Q(**{f'id__{compare}': pk})
+
+        if value is None:
+            after_nulls = Q(**{f'{self.field}__isnull': True}) & id_filter
+            return after_nulls | Q(**{f'{self.field}__isnull': False}) if reverse else after_nulls
+
+        position_filter = Q(**{f'{self.field}__{compare}': value}) | (Q(**{self.field: value}) & id_filter)
+        if self.model_field.null and not reverse:
+            position_filter |= Q(**{f'{self.field}__isnull': True})
+        return position_filter
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.field)
+        payload = {
+            'o': f"{'-' if self.descending else ''}{self.field}",
+            'v': value.isoformat() if value is not None else None,
+            'i': instance.pk,
+            'r': int(reverse),
+        }
+        return urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()))
+            ordering = f"{'-' if self.descending else ''}{self.field}"
+            if payload['o'] != ordering:
+                raise ValueError("Cursor was issued for another ordering.")
+            value = payload['v']
+            if value is not None:
+                value = self.model_field.to_python(value)
+            return (value, int(payload['i'])), bool(payload['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
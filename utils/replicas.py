@@ -0,0 +1,58 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+PIN_KEY = 'db:primary_pin:{identity}'
+
+# Replica serving the reads of the current request, None for the primary.
+current_replica = ContextVar('current_replica', default=None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to the replica chosen for the current request, if any, and
+    everything else to the primary. Reads outside requests that opted in
+    (Celery tasks, management commands, writes) stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every configured database is the primary or holds its rows, the
+        # replica stand-in of test runs included.
+        return obj1._state.db in settings.DATABASES and obj2._state.db in settings.DATABASES
+
+
+def get_client_identity(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"address:{request.META.get('REMOTE_ADDR')}"
+
+
+def pin_to_primary(request):
+    """
+    Serves the reads of the client of `request` from the primary for the
+    next `DATABASE_REPLICA_STICKY_SECONDS`, so it reads its own writes
+    while the replicas catch up.
+    """
+    cache.set(PIN_KEY.format(identity=get_client_identity(request)), 1, settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+
+def choose_replica(request):
+    """
+    Returns the replica alias to read from for `request`, or None when it
+    must read from the primary.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if cache.get(PIN_KEY.format(identity=get_client_identity(request))) is not None:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
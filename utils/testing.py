@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from utils.instrumentation import collect_queries
+
+# Actions a viewset has when it defines the method of the same name.
+STANDARD_ACTIONS = ('list', 'create', 'retrieve', 'update', 'partial_update', 'destroy')
+
+
+def get_viewset_actions(viewset):
+    actions = [name for name in STANDARD_ACTIONS if hasattr(viewset, name)]
+    return actions + [extra.__name__ for extra in viewset.get_extra_actions()]
+
+
+class QueryBudgetMixin:
+    """
+    TestCase assertions for the `query_budgets` viewsets declare, a mapping
+    of action to the most SQL queries one request may run. Budgets are
+    measured inside the test transaction, so they include the savepoints of
+    atomic blocks.
+    """
+
+    def assertQueryBudgetsDeclared(self, viewset):
+        missing = [action for action in get_viewset_actions(viewset) if action not in viewset.query_budgets]
+        self.assertFalse(missing, f"{viewset.__name__} declares no query budget for {', '.join(missing)}.")
+
+    @contextmanager
+    def assertWithinQueryBudget(self, viewset, action):
+        """
+        Fails when the block runs more queries than the budget of `action`,
+        listing them. Consume streaming responses inside the block.
+        """
+        budget = viewset.query_budgets[action]
+        with collect_queries(max_statements=1000) as stats:
+            yield stats
+        if stats.count > budget:
+            statements = '\n'.join(f"{index}. {statement['sql']}" for index, statement in enumerate(stats.statements, 1))
+            self.fail(f"{viewset.__name__}.{action} ran {stats.count} queries, over its budget of {budget}:\n{statements}")
@@ -1,9 +1,11 @@
 from rest_framework.viewsets import GenericViewSet
 
-from .mixins import GetPermissionClassesMixin, GetSerializerClassMixin
+from .mixins import GetPermissionClassesMixin, GetSerializerClassMixin, IdentityMapMixin, ReplicaReadMixin
 
 
 class BaseModelViewSetPlain(
+    ReplicaReadMixin,
+    IdentityMapMixin,
     GetPermissionClassesMixin,
     GetSerializerClassMixin,
     GenericViewSet,
@@ -1,5 +1,22 @@
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 
+from utils.cache import build_cache_key, get_generations, record_cache_outcome
+from utils.pagination import KeysetPagination, uses_cursor_pagination
+from utils.replicas import choose_replica, current_replica, pin_to_primary
+
 
 class PartialUpdateModelMixin:
     def perform_update(self, serializer):
@@ -82,3 +99,274 @@ class GetPermissionClassesMixin:
             return action_permissions
         except (KeyError, AttributeError):
             return tuple(super().get_permissions())
+
+
+class IdentityMapMixin:
+    """
+    Request-scoped identity map: an instance loaded once through `load_object`
+    or `get_object` is handed out again for the rest of the request, so
+    permissions, the action and serializers (through the view in their
+    context) share one row instead of fetching it again.
+
+    Entries are keyed by model, lookup and whether the row was locked, so a
+    locking read never reuses an instance loaded without the lock. Callers
+    are expected to load through the view's queryset, whose select_related
+    then also covers the related objects they need.
+    """
+
+    @cached_property
+    def loaded_objects(self):
+        return {}
+
+    def load_object(self, queryset, **lookup):
+        key = (
+            queryset.model._meta.label,
+            bool(queryset.query.select_for_update),
+            tuple(sorted((field, str(value)) for field, value in lookup.items())),
+        )
+        if key not in self.loaded_objects:
+            self.loaded_objects[key] = get_object_or_404(queryset, **lookup)
+        return self.loaded_objects[key]
+
+    def get_object(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        assert lookup_url_kwarg in self.kwargs, (
+            f'Expected view {self.__class__.__name__} to be called with a URL keyword '
+            f'argument named "{lookup_url_kwarg}".'
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        instance = self.load_object(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+
+class ReplicaReadMixin:
+    """
+    Serves `replica_read_actions` from a read replica, chosen once per request
+    so all its reads see the same snapshot. Any other action reads from the
+    primary, and a successful unsafe request pins its client (user, or
+    address when anonymous) to the primary for
+    `DATABASE_REPLICA_STICKY_SECONDS` so it reads its own writes.
+    """
+    replica_read_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_read_actions:
+            replica = choose_replica(request)
+            if replica is not None:
+                self.replica_token = current_replica.set(replica)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Also reached when an exception escapes the view.
+            if getattr(self, 'replica_token', None) is not None:
+                current_replica.reset(self.replica_token)
+                self.replica_token = None
+
+
+class CursorPaginationMixin:
+    """
+    Lets clients opt in to keyset pagination per request by sending
+    `?pagination=cursor` or a `cursor` from a previous page. Requests
+    without either keep the default pagination class.
+    """
+    cursor_pagination_class = KeysetPagination
+    cursor_ordering_fields = ('created_at',)
+
+    def uses_cursor_pagination(self):
+        return uses_cursor_pagination(self.request.query_params)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.uses_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+def get_request_variant(request):
+    """
+    Returns the normalized query parameters and the caller, which together
+    with the URL kwargs select the representation a read returns.
+    """
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    identity = request.user.pk if request.user.is_authenticated else 'anonymous'
+    return params, identity
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource was modified since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+class ConditionalRequestMixin:
+    """
+    Adds ETag and Last-Modified validators to `retrieve` and an ETag to
+    `list`, answering `304 Not Modified` to matching `If-None-Match` /
+    `If-Modified-Since` requests without serializing anything, and enforces
+    `If-Match` / `If-Unmodified-Since` on `conditional_update_actions`.
+
+    `validator_fields` lists the timestamps the representation depends on,
+    including those of nested objects, e.g. `assigned_to__updated_at`.
+    Detail validators read them from the loaded instance. List ETags are
+    derived from the generations of `validator_models` (see utils.cache)
+    instead, which change whenever any of their rows does: checking one
+    costs a cache read and no query, at the price of also changing on
+    writes outside the listed rows. Lists without `validator_models`, or
+    read from a replica, get no validators.
+    """
+    validator_fields = ('updated_at',)
+    validator_models = ()
+    conditional_update_actions = ('partial_update',)
+
+    @staticmethod
+    def build_validators(values):
+        timestamps = [value for value in values if value is not None and hasattr(value, 'timestamp')]
+        digest = hashlib.md5('|'.join(str(value) for value in values).encode()).hexdigest()
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        return f'"{digest}"', last_modified
+
+    def get_object_validators(self, instance):
+        values = [instance.pk]
+        for field in self.validator_fields:
+            value = instance
+            for attname in field.split('__'):
+                value = getattr(value, attname, None)
+                if value is None:
+                    break
+            values.append(value)
+        return self.build_validators(values)
+
+    def get_list_etag(self, request):
+        # Generations are read before the rows, so a write committed in
+        # between can only make the ETag older than the data, never newer.
+        params, identity = get_request_variant(request)
+        generations = get_generations(model._meta.label for model in self.validator_models)
+        parts = (self.basename, request.accepted_renderer.format, params, sorted(self.kwargs.items()), identity)
+        digest = hashlib.md5(f'{parts}:{generations}'.encode()).hexdigest()
+        return f'"{digest}"'
+
+    @staticmethod
+    def set_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def is_conditional_update(self):
+        return self.action in self.conditional_update_actions and self.request.method not in ('GET', 'HEAD')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.is_conditional_update():
+            # Held until the update commits, so a concurrent writer cannot
+            # slip in between the precondition check and the write.
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.is_conditional_update():
+            etag, last_modified = self.get_object_validators(instance)
+            if get_conditional_response(self.request, etag=etag, last_modified=last_modified) is not None:
+                raise PreconditionFailed()
+        return instance
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return self.set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        if not self.validator_models:
+            return super().list(request, *args, **kwargs)
+        etag = self.get_list_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            if current_replica.get() is not None:
+                # A lagging replica may return rows older than the
+                # generations, which would then validate stale data.
+                return response
+        return self.set_validators(response, etag, None)
+
+    @transaction.atomic
+    def partial_update(self, request, *args, **kwargs):
+        return super().partial_update(request, *args, **kwargs)
+
+
+class ResponseCacheMixin:
+    """
+    Caches the data of successful `list` and `retrieve` responses when
+    `RESPONSE_CACHE_ENABLED` is set. Entries are keyed by the action, the
+    normalized query parameters, the URL kwargs, the caller and the current
+    generation of every model in `response_cache_models`, so a write to any
+    of them (see utils.cache.invalidate_cached_responses) retires all
+    entries at once instead of deleting them one by one.
+
+    Place it before ConditionalRequestMixin: the validators are cached along
+    with the data, so a hit can still answer `304 Not Modified`. Misses are
+    read from the primary even in requests routed to a read replica (see
+    ReplicaReadMixin), so that they can be stored.
+    """
+    response_cache_name = None
+    response_cache_models = ()
+    response_cache_timeout = None
+
+    def get_response_cache_key(self, request):
+        params, identity = get_request_variant(request)
+        kwargs = sorted(self.kwargs.items())
+        generations = get_generations(model._meta.label for model in self.response_cache_models)
+        return build_cache_key(self.response_cache_name, self.action, params, kwargs, identity, generations)
+
+    def cached_response(self, request, build_response):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return build_response()
+
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        record_cache_outcome(self.response_cache_name, hit=entry is not None)
+        if entry is not None:
+            data, headers = entry
+            etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+            response = None
+            if etag:
+                response = get_conditional_response(request, etag=etag, last_modified=parse_http_date_safe(last_modified))
+            if response is None:
+                response = Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        # Rows read from a lagging replica may predate the generations in
+        # the key, so misses are read from the primary. Hits are safe to
+        # serve to any request.
+        replica_token = current_replica.set(None)
+        try:
+            response = build_response()
+        finally:
+            current_replica.reset(replica_token)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {header: response[header] for header in ('ETag', 'Last-Modified') if header in response}
+            timeout = self.response_cache_timeout or settings.RESPONSE_CACHE_TIMEOUT
+            cache.set(key, (response.data, headers), timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, partial(super().retrieve, request, *args, **kwargs))